@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks for the relational operators.
+
+Each operator is timed against synthetic relations of increasing size, and
+the throughput (input tuples per second), peak memory and scaling exponent
+(how running time grows with size; 1.0 is linear) are reported. Every
+measurement runs in a forked child process, and peak memory is measured in
+a further child forked after the inputs are built, so it covers the
+operator alone. Unix only.
+
+Usage::
+
+    python bench/benchmark.py --sizes 1e3,1e4,1e5 --save baseline.json
+    python bench/benchmark.py --sizes 1e3,1e4,1e5 --compare baseline.json
+
+With ``--compare``, the exit status is non-zero if any operator's throughput
+dropped by more than ``--tolerance`` relative to the baseline.
+"""
+
+from bisect import bisect
+import cPickle as pickle
+import ctypes
+import ctypes.util
+import gc
+import json
+import math
+import optparse
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'lib'))
+
+import relations
+
+
+try:
+    malloc_trim = ctypes.CDLL(ctypes.util.find_library('c')).malloc_trim
+except (OSError, AttributeError):
+    malloc_trim = None
+
+
+def zipf_sampler(n_keys, skew, rng):
+
+    """
+    Return a function drawing keys in ``range(n_keys)``.
+
+    Key ``k`` is drawn with probability proportional to ``1 / (k + 1) ** skew``,
+    so a skew of 0 is uniform and larger skews concentrate on a few keys.
+    """
+
+    cumulative = []
+    total = 0.0
+    for k in xrange(n_keys):
+        total += 1.0 / (k + 1) ** skew
+        cumulative.append(total)
+    return lambda: bisect(cumulative, rng.random() * total)
+
+
+def make_facts(size, options, seed=0):
+
+    """
+    A relation of ``size`` tuples with fields ``id``, ``key`` and ``value``.
+
+    ``key`` follows a Zipf distribution over ``--keys`` distinct values and
+    ``value`` is uniform in [0, 1).
+    """
+
+    rng = random.Random(seed)
+    draw_key = zipf_sampler(options.keys, options.skew, rng)
+    facts = relations.Relation('id', 'key', 'value')
+    facts.add_rows((id_, draw_key(), rng.random()) for id_ in xrange(size))
+    return facts
+
+
+def make_overlapping(facts, seed=1):
+    """A union-compatible relation sharing half of its tuples with ``facts``."""
+
+    rng = random.Random(seed)
+    other = facts.clone()
+    other.add_rows(tuple_ if rng.random() < 0.5 else
+                   (tuple_.id + len(facts), tuple_.key, tuple_.value)
+                   for tuple_ in facts)
+    return other
+
+
+def make_dimension(options):
+    dimension = relations.Relation('key', 'label')
+    dimension.add_rows((key, 'label-%d' % key)
+                       for key in xrange(options.join_keys))
+    return dimension
+
+
+def setup_add(size, options):
+    rows = [tuple_._asdict() for tuple_ in make_facts(size, options)]
+
+    def add():
+        relation = relations.Relation('id', 'key', 'value')
+        for row in rows:
+            relation.add(**row)
+        return relation
+    return add
+
+
+def setup_add_rows(size, options):
+    rows = [tuple(tuple_) for tuple_ in make_facts(size, options)]
+    return lambda: relations.Relation('id', 'key', 'value').add_rows(rows)
+
+
+def setup_contains(size, options):
+    facts = make_facts(size, options)
+    probes = list(make_overlapping(facts))
+    return lambda: sum(1 for tuple_ in probes if tuple_ in facts)
+
+
+def setup_select(size, options):
+    facts = make_facts(size, options)
+    threshold = options.selectivity
+    return lambda: facts.select(lambda tuple_: tuple_.value < threshold)
+
+
+def setup_project(size, options):
+    facts = make_facts(size, options)
+    return lambda: facts.project('key', 'value')
+
+
+def setup_rename(size, options):
+    facts = make_facts(size, options)
+    return lambda: facts.rename(identifier='id')
+
+
+def set_operation(name):
+    def setup(size, options):
+        facts = make_facts(size, options)
+        other = make_overlapping(facts)
+        return lambda: getattr(facts, name)(other)
+    return setup
+
+
+def setup_natural_join(size, options):
+    facts = make_facts(size, options)
+    dimension = make_dimension(options)
+    return lambda: facts.natural_join(dimension)
+
+
+OPERATORS = [
+    ('add', setup_add),
+    ('add_rows', setup_add_rows),
+    ('contains', setup_contains),
+    ('select', setup_select),
+    ('project', setup_project),
+    ('rename', setup_rename),
+    ('union', set_operation('union')),
+    ('intersection', set_operation('intersection')),
+    ('difference', set_operation('difference')),
+    ('natural_join', setup_natural_join),
+]
+
+
+def max_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, other systems KiB.
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def proc_status_kb(name):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(name + ':'):
+                return int(line.split()[1])
+    raise IOError("No %s in /proc/self/status" % (name,))
+
+
+def reset_peak_rss():
+    """Start peak resident memory (VmHWM) over from the current RSS."""
+
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except IOError:
+        pass
+
+
+def in_child(function):
+
+    """
+    Call ``function()`` in a forked child process and return its result.
+
+    The result must be picklable; an exception in the child is returned as
+    a dict with an ``'error'`` message.
+    """
+
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        try:
+            outcome = function()
+        except Exception, exc:
+            outcome = {'error': '%s: %s' % (type(exc).__name__, exc)}
+        with os.fdopen(write_end, 'wb') as pipe:
+            pickle.dump(outcome, pipe, pickle.HIGHEST_PROTOCOL)
+        os._exit(0)
+
+    os.close(write_end)
+    with os.fdopen(read_end, 'rb') as pipe:
+        outcome = pickle.load(pipe)
+    os.waitpid(pid, 0)
+    return outcome
+
+
+def peak_growth_kb(operation):
+
+    """
+    Measure how far one run of an operation raises peak resident memory.
+
+    The operation runs in a fresh child, whose peak starts out at its
+    current resident memory, so memory used while setting up the inputs
+    doesn't hide the operation's own peak. Memory freed during setup is
+    first handed back to the system (where malloc_trim exists), since the
+    operation could otherwise reuse it without raising the peak. On Linux
+    the peak is VmHWM, reset once the heap is trimmed; elsewhere it is the
+    child's ru_maxrss.
+    """
+
+    def measure():
+        if malloc_trim is not None:
+            malloc_trim(0)
+        reset_peak_rss()
+        try:
+            baseline_kb = proc_status_kb('VmRSS')
+        except IOError:
+            # Without /proc, rely on the fresh child's ru_maxrss.
+            baseline_kb, peak_rss_kb = max_rss_kb(), max_rss_kb
+        else:
+            peak_rss_kb = lambda: proc_status_kb('VmHWM')
+        operation()
+        return {'peak_kb': max(0, peak_rss_kb() - baseline_kb)}
+    return in_child(measure)
+
+
+def measure_in_child(setup, size, options):
+
+    """
+    Set up and time one operator in a forked child process.
+
+    Returns a dict with the best time over ``--repeat`` runs, and the growth
+    in peak resident memory (in KiB) during a single run, measured from a
+    further child forked once the inputs are built.
+    """
+
+    def measure():
+        operation = setup(size, options)
+        gc.collect()
+        memory = peak_growth_kb(operation)
+        if 'error' in memory:
+            return memory
+        times = []
+        for _ in xrange(options.repeat):
+            start = time.time()
+            result = operation()
+            times.append(time.time() - start)
+            del result
+        return {'seconds': min(times), 'peak_kb': memory['peak_kb']}
+    return in_child(measure)
+
+
+def run(options):
+    results = {}
+    for name, setup in OPERATORS:
+        if options.operators and name not in options.operators:
+            continue
+        for size in options.sizes:
+            if name == 'natural_join' and size > options.max_join_size:
+                continue
+            outcome = measure_in_child(setup, size, options)
+            if 'seconds' in outcome:
+                outcome['throughput'] = size / max(outcome['seconds'], 1e-9)
+            results['%s@%d' % (name, size)] = dict(outcome, operator=name,
+                                                   size=size)
+            report_line(results['%s@%d' % (name, size)])
+    return results
+
+
+def report_line(result):
+    if 'error' in result:
+        print '%-14s %10d  ERROR %s' % (result['operator'], result['size'],
+                                        result['error'])
+    else:
+        print '%-14s %10d  %12.0f tuples/s  %10.4f s  %10d KiB peak' % (
+            result['operator'], result['size'], result['throughput'],
+            result['seconds'], result['peak_kb'])
+    sys.stdout.flush()
+
+
+def report_scaling(results):
+
+    """
+    Print the scaling exponent between consecutive sizes for each operator.
+
+    The exponent is the slope of log(time) against log(size): about 1.0 for
+    linear operators, 2.0 for quadratic ones.
+    """
+
+    print
+    print 'Scaling exponents (slope of log time vs. log size):'
+    by_operator = {}
+    for result in results.itervalues():
+        if 'seconds' in result:
+            by_operator.setdefault(result['operator'], []).append(result)
+    for name, _ in OPERATORS:
+        points = sorted(by_operator.get(name, []), key=lambda r: r['size'])
+        slopes = []
+        for small, large in zip(points, points[1:]):
+            if small['seconds'] > 0 and large['seconds'] > 0:
+                slopes.append('%d->%d: %.2f' % (
+                    small['size'], large['size'],
+                    math.log(large['seconds'] / small['seconds']) /
+                    math.log(float(large['size']) / small['size'])))
+        if slopes:
+            print '  %-14s %s' % (name, ', '.join(slopes))
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of descriptions of regressions against a baseline."""
+
+    regressions = []
+    for key, result in sorted(results.iteritems()):
+        previous = baseline.get(key)
+        if not previous or 'throughput' not in previous:
+            continue
+        if 'throughput' not in result:
+            regressions.append('%s: failed (%s)' % (key, result['error']))
+            continue
+        ratio = result['throughput'] / previous['throughput']
+        if ratio < 1 - tolerance:
+            regressions.append('%s: %.0f tuples/s vs. %.0f in baseline (%.0f%%)'
+                               % (key, result['throughput'],
+                                  previous['throughput'], ratio * 100))
+    return regressions
+
+
+def parse_sizes(value):
+    return [int(float(size)) for size in value.split(',') if size]
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--sizes', default='1e3,1e4,1e5',
+                      help='comma-separated relation sizes [%default]')
+    parser.add_option('--operators', default='',
+                      help='comma-separated operators to run [all]')
+    parser.add_option('--keys', type='int', default=1000,
+                      help='distinct values of the key field [%default]')
+    parser.add_option('--skew', type='float', default=1.0,
+                      help='Zipf exponent of the key distribution [%default]')
+    parser.add_option('--selectivity', type='float', default=0.1,
+                      help='fraction of tuples kept by select [%default]')
+    parser.add_option('--join-keys', type='int', default=100,
+                      help='tuples in the joined dimension relation '
+                           '[%default]')
+    parser.add_option('--max-join-size', type='int', default=100000,
+                      help='largest size to run natural_join at [%default]')
+    parser.add_option('--repeat', type='int', default=3,
+                      help='runs per measurement; the best is kept '
+                           '[%default]')
+    parser.add_option('--save', metavar='FILE',
+                      help='write the results to FILE as JSON')
+    parser.add_option('--compare', metavar='FILE',
+                      help='compare against results saved with --save')
+    parser.add_option('--tolerance', type='float', default=0.25,
+                      help='allowed fractional drop in throughput '
+                           '[%default]')
+    options, args = parser.parse_args(argv)
+    options.sizes = parse_sizes(options.sizes)
+    options.operators = [op for op in options.operators.split(',') if op]
+
+    results = run(options)
+    report_scaling(results)
+
+    if options.save:
+        with open(options.save, 'w') as file_:
+            json.dump(results, file_, indent=2, sort_keys=True)
+
+    if options.compare:
+        with open(options.compare) as file_:
+            regressions = compare(results, json.load(file_), options.tolerance)
+        print
+        if regressions:
+            print 'Regressions against %s:' % (options.compare,)
+            for regression in regressions:
+                print '  ' + regression
+            return 1
+        print 'No regressions against %s.' % (options.compare,)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
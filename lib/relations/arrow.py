@@ -0,0 +1,72 @@
+"""
+Conversion between relations and Apache Arrow tables.
+
+This needs the optional ``pyarrow`` package (``pip install relations[arrow]``).
+Relations opened from a saved file (see :mod:`relations.storage`) are
+converted column-by-column into dictionary-encoded Arrow arrays whose indices
+share memory with the file; other relations are transposed into columns once
+and converted in a single pass per column.
+"""
+
+from itertools import izip
+
+from relations.relation import Relation
+
+try:
+    import numpy
+    import pyarrow
+except ImportError:
+    numpy = pyarrow = None
+
+
+__all__ = ['to_arrow', 'from_arrow']
+
+
+def require_pyarrow():
+    if pyarrow is None:
+        raise ImportError("Arrow interchange requires the pyarrow package")
+
+
+def to_arrow(relation):
+
+    """
+    Convert a relation into a :class:`pyarrow.Table`.
+
+    The table has one column per field, in the relation's (sorted) field
+    order.
+    """
+
+    require_pyarrow()
+    fields = list(relation.tuple._fields)
+    if getattr(relation, 'is_mapped', False):
+        arrays = []
+        for field in fields:
+            codes, values = relation.column(field)
+            indices = pyarrow.array(numpy.frombuffer(codes, dtype='<i4'))
+            arrays.append(pyarrow.DictionaryArray.from_arrays(
+                indices, pyarrow.array(values)))
+    else:
+        # Read once: SQLiteRelation.tuples queries the whole table each time.
+        rows = list(relation)
+        if rows:
+            arrays = [pyarrow.array(list(column)) for column in izip(*rows)]
+        else:
+            arrays = [pyarrow.array([]) for field in fields]
+    return pyarrow.Table.from_arrays(arrays, names=fields)
+
+
+def from_arrow(table, relation_class=Relation):
+
+    """
+    Build a relation from a :class:`pyarrow.Table`.
+
+    Every column of the table becomes a field; duplicate rows are collapsed,
+    as with any relation.
+    """
+
+    require_pyarrow()
+    relation = relation_class(*map(str, table.schema.names))
+    columns = [table.column(field).to_pylist()
+               for field in relation.tuple._fields]
+    relation.add_rows(izip(*columns))
+    return relation
@@ -0,0 +1,128 @@
+"""
+Bags (multisets) of tuples, for pipelines which deduplicate once at the end.
+
+Every operator on a :class:`Relation` removes duplicates as it goes, which
+means hashing every tuple it produces. A :class:`Bag` keeps its tuples in a
+plain list, and its operators pass duplicates through untouched; call
+:meth:`Bag.distinct` at the end of the pipeline to get a relation:
+
+    >>> departments = (employees.as_bag()
+    ...                .select(lambda emp: emp.salary > 1000)
+    ...                .project('dept_name')
+    ...                .distinct())
+
+Bags also count correctly, since duplicates are kept:
+
+    >>> employees.as_bag().project('dept_name').counts()
+    Counter({Tuple(dept_name='Sales'): 2, Tuple(dept_name='Finance'): 2})
+"""
+
+from collections import Counter
+from itertools import imap
+
+import urecord
+
+from relations.profiling import (hashes_first_input, hashes_nothing,
+                                 instrumented)
+from relations.relation import (NotUnionCompatible, Relation, check_defined,
+                                complete_renaming)
+from relations.tuple import Tuple
+
+
+__all__ = ['Bag']
+
+
+class Bag(object):
+
+    """An append-only multiset of tuples with a fixed heading."""
+
+    def __init__(self, *fields):
+        self.heading = frozenset(fields)
+        self.tuple = urecord.Record(*sorted(fields), instance=Tuple)
+        self.tuples = []
+
+    def __repr__(self):
+        return '<Bag%r>' % (self.tuple._fields,)
+
+    def __len__(self):
+        """The number of tuples in this bag, counting duplicates."""
+
+        return len(self.tuples)
+
+    def __iter__(self):
+        return iter(self.tuples)
+
+    def __contains__(self, tuple_):
+        # A linear scan; call distinct() first for repeated lookups.
+        return tuple_ in self.tuples
+
+    def clone(self):
+        """Create a new, empty bag with the same heading as this one."""
+
+        return type(self)(*self.tuple._fields)
+
+    def add(self, **kwargs):
+        """Add a tuple to this bag, even if it's already present."""
+
+        tuple_ = self.tuple(**kwargs)
+        self.tuples.append(tuple_)
+        return tuple_
+
+    def add_rows(self, rows):
+        """Add many tuples, given as sequences of values in field order."""
+
+        make_tuple = self.tuple
+        self.tuples.extend(imap(lambda row: make_tuple(*row), rows))
+
+    @instrumented(hashes_nothing)
+    def select(self, predicate):
+        """Filter the tuples in this bag, keeping duplicates."""
+
+        new_bag = self.clone()
+        new_bag.tuples = filter(predicate, self.tuples)
+        return new_bag
+
+    @instrumented(hashes_nothing)
+    def project(self, *fields):
+        """Restrict the heading to the given fields, keeping duplicates."""
+
+        check_defined(self, fields, 'project')
+        new_bag = type(self)(*fields)
+        projection = self.tuple._make_projection(*new_bag.tuple._fields)
+        new_bag.tuples = map(new_bag.tuple._projector(projection),
+                             self.tuples)
+        return new_bag
+
+    @instrumented(hashes_nothing)
+    def rename(self, **new_fields):
+        """Rename some fields, as for :meth:`Relation.rename`."""
+
+        new_fields = complete_renaming(self, new_fields)
+        new_bag = type(self)(*new_fields.keys())
+        reordering = self.tuple._make_reordering(**new_fields)
+        new_bag.tuples = map(new_bag.tuple._projector(reordering),
+                             self.tuples)
+        return new_bag
+
+    @instrumented(hashes_nothing)
+    def union_all(self, other):
+        """Concatenate this bag with another bag or relation."""
+
+        if self.heading != other.heading:
+            raise NotUnionCompatible
+        new_bag = self.clone()
+        new_bag.tuples = self.tuples + list(other)
+        return new_bag
+
+    @instrumented(hashes_first_input)
+    def distinct(self, relation_class=Relation):
+        """Remove duplicates, returning a new relation."""
+
+        new_relation = relation_class(*self.tuple._fields)
+        new_relation.add_rows(self.tuples)
+        return new_relation
+
+    def counts(self):
+        """Count the occurrences of each distinct tuple."""
+
+        return Counter(self.tuples)
@@ -0,0 +1,113 @@
+"""
+Bloom filters over the values of some fields of a relation.
+
+A :class:`BloomFilter` answers "might this key be present?" in a fixed
+number of bits, with no false negatives and a tunable rate of false
+positives. Filters hash keys deterministically, so they can be serialized
+and shipped to other processes, to reduce their partitions of a relation to
+the tuples which might join before those tuples are sent anywhere:
+
+    >>> filter_ = departments.bloom_filter('dept_name')
+    >>> data = filter_.to_bytes()
+    >>> # ... elsewhere ...
+    >>> candidates = partition.prefilter(BloomFilter.from_bytes(data))
+"""
+
+import math
+import struct
+
+from relations.hashing import digest
+from relations.relation import RelationalError
+
+
+__all__ = ['BloomFilter']
+
+
+class BloomFilter(object):
+
+    """
+    A Bloom filter of keys (tuples of values) taken from ``fields``.
+
+    The filter is sized for ``capacity`` keys at the given ``error_rate``
+    (probability of a false positive). Keys are hashed by value (see
+    :mod:`relations.hashing`), so filters give the same answers in any
+    process, and equal keys such as ``(1,)`` and ``(1.0,)`` always match.
+    """
+
+    MAGIC = 'BLOOM\x01'
+    HEADER = struct.Struct('<QIH')
+
+    def __init__(self, fields, capacity, error_rate=0.01):
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        capacity = max(capacity, 1)
+        self.fields = tuple(fields)
+        self.num_bits = max(8, int(math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(
+            float(self.num_bits) / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def __repr__(self):
+        return '<BloomFilter on %r: %d bits, %d hashes>' % (
+            self.fields, self.num_bits, self.num_hashes)
+
+    def _positions(self, key):
+        # Double hashing: the i-th probe is h1 + i * h2.
+        hash1, hash2 = struct.unpack('<QQ', digest(key))
+        num_bits = self.num_bits
+        return [(hash1 + i * hash2) % num_bits
+                for i in xrange(self.num_hashes)]
+
+    def add(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def update(self, other):
+
+        """
+        Add all the keys of another, identically-configured filter to this one.
+
+        Filters built separately over partitions of one relation can be
+        merged this way into a filter over the whole relation.
+        """
+
+        if (other.fields, other.num_bits, other.num_hashes) != (
+                self.fields, self.num_bits, self.num_hashes):
+            raise RelationalError("Bloom filters have different shapes")
+        self.bits = bytearray(a | b for a, b in zip(self.bits, other.bits))
+        return self
+
+    def to_bytes(self):
+        """Serialize this filter, to be read back with :meth:`from_bytes`."""
+
+        fields = '\x00'.join(self.fields)
+        return ''.join([self.MAGIC,
+                        self.HEADER.pack(self.num_bits, self.num_hashes,
+                                         len(fields)),
+                        fields, str(self.bits)])
+
+    @classmethod
+    def from_bytes(cls, data):
+        if not data.startswith(cls.MAGIC):
+            raise ValueError("Not a serialized Bloom filter")
+        offset = len(cls.MAGIC)
+        num_bits, num_hashes, fields_length = cls.HEADER.unpack_from(
+            data, offset)
+        offset += cls.HEADER.size
+        fields = data[offset:offset + fields_length]
+
+        filter_ = cls.__new__(cls)
+        filter_.fields = tuple(fields.split('\x00')) if fields else ()
+        filter_.num_bits = num_bits
+        filter_.num_hashes = num_hashes
+        filter_.bits = bytearray(data[offset + fields_length:])
+        return filter_
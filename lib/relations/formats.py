@@ -0,0 +1,136 @@
+"""
+Streaming import and export of relations as CSV and JSON lines.
+
+Rows are read in chunks of ``chunk_size`` and handed to
+:meth:`Relation.add_rows`, with the mapping from input columns to the
+relation's (sorted) field order worked out once per file rather than once per
+row. Exports write straight from the relation's tuples.
+"""
+
+from contextlib import contextmanager
+from itertools import islice, izip
+from operator import itemgetter
+import csv
+import json
+
+from relations.relation import Relation, RelationalError, UndefinedFields
+
+
+__all__ = ['read_csv', 'read_jsonl', 'write_csv', 'write_jsonl']
+
+
+CHUNK_SIZE = 10000
+
+
+@contextmanager
+def opened(file_or_path, mode):
+    """Use an open file as-is, or open (and later close) a path."""
+
+    if hasattr(file_or_path, 'read') or hasattr(file_or_path, 'write'):
+        yield file_or_path
+    else:
+        with open(file_or_path, mode) as file_:
+            yield file_
+
+
+def row_getter(columns, fields):
+
+    """
+    Build a function extracting ``fields``, in order, from a row.
+
+    ``columns`` is a sequence of column names (for list rows) or ``None`` (for
+    dict rows). The function always returns a tuple.
+    """
+
+    if columns is None:
+        keys = tuple(fields)
+    else:
+        missing = tuple(field for field in fields if field not in columns)
+        if missing:
+            raise UndefinedFields("Fields missing from input: %r" % (missing,))
+        keys = tuple(list(columns).index(field) for field in fields)
+
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda row: (row[key],)
+    return itemgetter(*keys)
+
+
+def load_chunks(relation, rows, getter, chunk_size):
+    rows = iter(rows)
+    while True:
+        chunk = map(getter, islice(rows, chunk_size))
+        if not chunk:
+            return relation
+        relation.add_rows(chunk)
+
+
+def read_csv(file_or_path, fields=None, chunk_size=CHUNK_SIZE,
+             relation_class=Relation, **csv_options):
+
+    """
+    Read a relation from a CSV file whose first row names the columns.
+
+    If ``fields`` is given, only those columns are read; otherwise the heading
+    is taken from the header row. Values are left as strings. Any extra
+    keyword arguments are passed to :func:`csv.reader`.
+    """
+
+    with opened(file_or_path, 'rb') as file_:
+        reader = csv.reader(file_, **csv_options)
+        try:
+            columns = next(reader)
+        except StopIteration:
+            raise RelationalError("CSV input has no header row")
+        relation = relation_class(*(fields or columns))
+        getter = row_getter(columns, relation.tuple._fields)
+        return load_chunks(relation, reader, getter, chunk_size)
+
+
+def read_jsonl(file_or_path, fields=None, chunk_size=CHUNK_SIZE,
+               relation_class=Relation):
+
+    """
+    Read a relation from a file containing one JSON object per line.
+
+    If ``fields`` is not given, the heading is taken from the keys of the
+    first object. Blank lines are skipped.
+    """
+
+    with opened(file_or_path, 'rb') as file_:
+        objects = (json.loads(line) for line in file_ if line.strip())
+        if fields is None:
+            try:
+                first = next(objects)
+            except StopIteration:
+                raise RelationalError("JSON lines input is empty; "
+                                      "no fields to infer a heading from")
+            relation = relation_class(*map(str, first.keys()))
+            getter = row_getter(None, relation.tuple._fields)
+            relation.add_rows([getter(first)])
+        else:
+            relation = relation_class(*fields)
+            getter = row_getter(None, relation.tuple._fields)
+        try:
+            return load_chunks(relation, objects, getter, chunk_size)
+        except KeyError, exc:
+            raise UndefinedFields("Field missing from input: %r" %
+                                  (exc.args[0],))
+
+
+def write_csv(relation, file_or_path, **csv_options):
+    """Write a relation to a CSV file, with a header row of field names."""
+
+    with opened(file_or_path, 'wb') as file_:
+        writer = csv.writer(file_, **csv_options)
+        writer.writerow(relation.tuple._fields)
+        writer.writerows(relation)
+
+
+def write_jsonl(relation, file_or_path):
+    """Write a relation to a file as one JSON object per line."""
+
+    fields = relation.tuple._fields
+    with opened(file_or_path, 'wb') as file_:
+        file_.writelines(json.dumps(dict(izip(fields, tuple_))) + '\n'
+                         for tuple_ in relation)
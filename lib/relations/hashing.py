@@ -0,0 +1,66 @@
+"""
+Hashing values by what they're equal to, rather than how they're written.
+
+Bloom filters and sketches must hash a value the same way in every process,
+so they can't use :func:`hash`; hashing ``repr()`` instead would treat
+``1``, ``1L`` and ``1.0`` (or ``'a'`` and ``u'a'``) as different values,
+although Python and relations consider them equal. :func:`encode` gives
+equal values the same bytes.
+"""
+
+from hashlib import md5
+import numbers
+
+
+__all__ = ['encode', 'digest']
+
+
+def encode(value):
+
+    """
+    Encode a value as a byte string which is the same for equal values.
+
+    Numbers of any type (including :class:`~decimal.Decimal`) with an
+    integral value are encoded as integers, and others equal to a float as
+    that float's ``repr()``; byte strings which are plain ASCII are encoded
+    like the equal unicode strings; tuples are encoded element by element.
+    Anything else falls back to its ``repr()``.
+    """
+
+    if isinstance(value, tuple):
+        parts = map(encode, value)
+        return 't%d:%s' % (len(parts), ''.join('%d:%s' % (len(part), part)
+                                               for part in parts))
+    elif isinstance(value, unicode):
+        return 's' + value.encode('utf-8')
+    elif isinstance(value, str):
+        try:
+            value.decode('ascii')
+        except UnicodeDecodeError:
+            # Never equal to a unicode string.
+            return 'b' + value
+        return 's' + value
+    elif isinstance(value, numbers.Number):
+        # Includes Decimal, Fraction and complex, which can equal ints and
+        # floats.
+        if isinstance(value, numbers.Complex) and value.imag:
+            return 'c' + repr(complex(value))
+        real = value.real if isinstance(value, numbers.Complex) else value
+        try:
+            integer = int(real)
+        except (OverflowError, ValueError):
+            # Infinities and NaN.
+            return 'f' + repr(float(real))
+        if integer == real:
+            return 'i%d' % (integer,)
+        if float(real) == real:
+            return 'f' + repr(float(real))
+    elif value is None:
+        return 'n'
+    return 'r' + repr(value)
+
+
+def digest(value):
+    """A 16-byte hash of a value, the same in every process."""
+
+    return md5(encode(value)).digest()
@@ -0,0 +1,253 @@
+"""
+Batched, concurrent ingestion of tuples into a relation.
+
+An :class:`Ingester` accepts rows from any number of producer threads,
+queues them, and commits them to a relation in batches through
+:meth:`Relation.add_rows` on a worker thread. The queue is bounded, so
+producers which outpace the worker block until it catches up. Consumers can
+wait for commits (or register callbacks) instead of polling the relation:
+
+    >>> with Ingester(events, batch_size=500) as ingester:
+    ...     ingester.feed(row_source)
+    >>> len(events)
+    10000
+
+Every method which waits (:meth:`~Ingester.put` when the queue is full,
+:meth:`~Ingester.flush`, :meth:`~Ingester.wait` and
+:meth:`~Ingester.close`) blocks the calling thread. Code running in an
+event loop should call them through an executor, so the loop keeps running
+while they wait:
+
+    >>> await loop.run_in_executor(None, ingester.put, row)
+    >>> version = await loop.run_in_executor(None, ingester.wait)
+"""
+
+from Queue import Queue, Empty
+import sys
+import threading
+import time
+
+from relations.formats import row_getter
+
+
+__all__ = ['Ingester']
+
+
+class Flush(object):
+    """A request, put on the queue, to commit everything before it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+STOP = object()
+
+
+def usable_from_other_threads(relation):
+    """Check whether a relation's database connection, if any, is shared."""
+
+    connection = getattr(relation, 'connection', None)
+    if connection is None:
+        return True
+    errors = []
+
+    def probe():
+        try:
+            connection.execute('SELECT 1')
+        except Exception as error:
+            errors.append(error)
+    thread = threading.Thread(target=probe)
+    thread.start()
+    thread.join()
+    return not errors
+
+
+class Ingester(object):
+
+    """
+    Buffer rows for a relation and add them in batches.
+
+    Rows may be sequences of values in the relation's field order (as for
+    :meth:`Relation.add_rows`) or mappings from field names to values.
+
+    ``batch_size`` rows are committed at a time, and a partial batch is
+    committed once no new rows have arrived for ``flush_interval`` seconds.
+    At most ``max_pending`` rows wait in the queue before :meth:`put` blocks.
+    With ``threaded=False`` no worker thread is started and rows are
+    committed by the producer once a batch is full.
+
+    Commits hold :attr:`lock`, which readers should also hold while the
+    ingester is running. Relations whose database connection can only be
+    used by the thread which created it (such as a
+    :class:`~relations.sqlite.SQLiteRelation` over a connection opened
+    without ``check_same_thread=False``) need ``threaded=False``.
+
+    Rows from batches which couldn't be committed are kept in
+    :attr:`failed`, and the error is raised in the next producer call.
+    """
+
+    def __init__(self, relation, batch_size=1000, max_pending=10000,
+                 flush_interval=0.1, threaded=True):
+        self.relation = relation
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = threading.RLock()
+        self.committed = threading.Condition(threading.Lock())
+        self.version = 0
+        self.callbacks = []
+        self.error = None
+        self.failed = []
+        self.closed = False
+        self._get_mapping = row_getter(None, relation.tuple._fields)
+        self._buffer = []
+
+        self.threaded = threaded
+        if threaded:
+            if not usable_from_other_threads(relation):
+                raise ValueError("%r can only be used from this thread; "
+                                 "use threaded=False" % (relation,))
+            self.queue = Queue(maxsize=max_pending)
+            self.worker = threading.Thread(target=self._run,
+                                           name='relations-ingester')
+            self.worker.daemon = True
+            self.worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def put(self, row, timeout=None):
+
+        """
+        Queue a row for adding to the relation.
+
+        Blocks while the queue is full, for at most ``timeout`` seconds if
+        given (raising :class:`Queue.Full` if the queue is still full).
+        """
+
+        self._check_open()
+        self._raise_error()
+        if hasattr(row, 'keys'):
+            row = self._get_mapping(row)
+        if self.threaded:
+            self.queue.put(row, timeout=timeout)
+        else:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.batch_size:
+                self._commit()
+
+    def feed(self, rows):
+        """Queue every row from an iterable."""
+
+        for row in rows:
+            self.put(row)
+
+    def flush(self):
+        """Block until every row queued so far has been committed."""
+
+        self._check_open()
+        if self.threaded:
+            request = Flush()
+            self.queue.put(request)
+            request.done.wait()
+        else:
+            self._commit()
+        self._raise_error()
+
+    def close(self):
+        """
+        Commit any remaining rows and stop the worker thread.
+
+        Rows can't be added to a closed ingester.
+        """
+
+        self.closed = True
+        if self.threaded:
+            if self.worker.is_alive():
+                self.queue.put(STOP)
+                self.worker.join()
+        else:
+            self._commit()
+        self._raise_error()
+
+    def subscribe(self, callback):
+        """Call ``callback(rows)`` with each batch of rows after it's added."""
+
+        self.callbacks.append(callback)
+
+    def wait(self, version=None, timeout=None):
+
+        """
+        Wait for a commit, returning the number of commits made so far.
+
+        Waits until more than ``version`` commits have been made (by default,
+        for the next commit), or until ``timeout`` seconds have passed.
+        """
+
+        deadline = None if timeout is None else time.time() + timeout
+        with self.committed:
+            if version is None:
+                version = self.version
+            while self.version <= version:
+                if deadline is None:
+                    self.committed.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.committed.wait(remaining)
+            return self.version
+
+    def _check_open(self):
+        if self.closed:
+            raise ValueError("Can't add rows to a closed ingester")
+
+    def _commit(self):
+        batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        try:
+            with self.lock:
+                self.relation.add_rows(batch)
+        except Exception:
+            self.failed.extend(batch)
+            raise
+        with self.committed:
+            self.version += 1
+            self.committed.notify_all()
+        for callback in list(self.callbacks):
+            callback(batch)
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except Empty:
+                self._safely_commit()
+                continue
+
+            if item is STOP:
+                self._safely_commit()
+                return
+            elif isinstance(item, Flush):
+                self._safely_commit()
+                item.done.set()
+            else:
+                self._buffer.append(item)
+                if len(self._buffer) >= self.batch_size:
+                    self._safely_commit()
+
+    def _safely_commit(self):
+        try:
+            self._commit()
+        except Exception:
+            # Keep draining the queue so producers don't block forever; the
+            # error is raised in the producer on its next call.
+            self.error = sys.exc_info()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error[0], error[1], error[2]
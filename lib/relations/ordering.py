@@ -0,0 +1,210 @@
+"""
+Ordering, limiting and top-k selection over relations.
+
+Relations are sets, so they have no order of their own. :meth:`order_by`
+returns a lazy :class:`Ordering` of a relation's tuples; taking a
+:meth:`~Ordering.limit` of it keeps only a bounded heap of ``n`` tuples
+rather than sorting everything, and relations which can already produce
+their tuples in the requested order (see :meth:`Relation._ordered_iter`)
+are read only as far as needed.
+
+Sort keys are field names, optionally prefixed with ``-`` for descending
+order, as in ``employees.order_by('dept_name', '-salary')``.
+"""
+
+from functools import cmp_to_key
+from heapq import heappush, heapreplace
+from itertools import count, islice
+
+from relations.relation import check_defined
+from relations.tuple import key_function
+
+
+__all__ = ['Ordering', 'BoundedHeap', 'parse_keys', 'sort_key', 'top_k']
+
+
+def parse_keys(relation, keys):
+
+    """
+    Parse sort keys into a list of ``(field, descending)`` pairs.
+
+    A single string is treated as one key.
+    """
+
+    if isinstance(keys, basestring):
+        keys = [keys]
+    parsed = [(key[1:], True) if key.startswith('-') else (key, False)
+              for key in keys]
+    if not parsed:
+        raise ValueError("At least one sort key is required")
+    check_defined(relation, [field for field, _ in parsed], 'order_by')
+    return parsed
+
+
+def sort_key(relation, parsed_keys):
+
+    """
+    Build a ``(key, reverse)`` pair for sorting a relation's tuples.
+
+    When every key has the same direction this is a plain tuple key;
+    otherwise it's a comparison-based key honouring each direction.
+    """
+
+    indices = relation.tuple._make_projection(
+        *[field for field, _ in parsed_keys])
+    directions = set(descending for _, descending in parsed_keys)
+    if len(directions) == 1:
+        return key_function(indices), directions.pop()
+
+    spec = [(index, descending) for index, (_, descending)
+            in zip(indices, parsed_keys)]
+
+    def compare(tuple1, tuple2):
+        for index, descending in spec:
+            result = cmp(tuple1[index], tuple2[index])
+            if result:
+                return -result if descending else result
+        return 0
+    return cmp_to_key(compare), False
+
+
+class Inverted(object):
+
+    """Wraps a sort key, reversing its order."""
+
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+
+class BoundedHeap(object):
+
+    """
+    Keeps the first ``size`` items pushed, in sort order, in O(size) memory.
+
+    The heap's root is always the worst item kept, so each push is a single
+    comparison unless the new item displaces it.
+    """
+
+    def __init__(self, size, key, reverse=False):
+        self.size = size
+        self.key = key
+        self.reverse = reverse
+        self.heap = []
+        self.counter = count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, item):
+        key = self.key(item)
+        if not self.reverse:
+            key = Inverted(key)
+        entry = (key, -next(self.counter), item)
+        if len(self.heap) < self.size:
+            heappush(self.heap, entry)
+        elif self.size and self.heap[0][0] < key:
+            heapreplace(self.heap, entry)
+
+    def sorted(self):
+        """Return the items kept, best first (ties in the order pushed)."""
+
+        return [item for _, _, item in sorted(self.heap, reverse=True)]
+
+
+class Ordering(object):
+
+    """
+    A relation's tuples in a given order, computed when iterated over.
+
+    An ordering is not itself a relation; use :meth:`to_relation` to collect
+    its tuples (order is lost) into one.
+    """
+
+    def __init__(self, relation, keys, limit=None):
+        self.relation = relation
+        self.keys = parse_keys(relation, keys)
+        self.limit_size = limit
+
+    def __repr__(self):
+        return '<Ordering of %r by %s%s>' % (
+            self.relation,
+            ', '.join(('-' if descending else '') + field
+                      for field, descending in self.keys),
+            '' if self.limit_size is None else ' limit %d' % self.limit_size)
+
+    def __len__(self):
+        if self.limit_size is None:
+            return len(self.relation)
+        return min(len(self.relation), self.limit_size)
+
+    def __iter__(self):
+        ordered = self.relation._ordered_iter(self.keys)
+        if ordered is not None:
+            return islice(ordered, self.limit_size)
+
+        key, reverse = sort_key(self.relation, self.keys)
+        if self.limit_size is None:
+            return iter(sorted(self.relation, key=key, reverse=reverse))
+        heap = BoundedHeap(self.limit_size, key, reverse)
+        for tuple_ in self.relation:
+            heap.push(tuple_)
+        return iter(heap.sorted())
+
+    def limit(self, size):
+        """Restrict this ordering to (at most) its first ``size`` tuples."""
+
+        if size < 0:
+            raise ValueError("Limit must be non-negative: %r" % (size,))
+        if self.limit_size is not None:
+            size = min(size, self.limit_size)
+        return type(self)(self.relation, [
+            ('-' if descending else '') + field
+            for field, descending in self.keys], limit=size)
+
+    def to_relation(self):
+        """Collect the tuples of this ordering into a new relation."""
+
+        new_relation = self.relation.clone()
+        new_relation.add_rows(self)
+        return new_relation
+
+
+def top_k(relation, size, keys, by=()):
+
+    """
+    Select the first ``size`` tuples in the order given by ``keys``, per group.
+
+    Groups are the distinct values of the ``by`` fields; with no ``by`` fields
+    the whole relation is one group. Only ``size`` tuples per group are held
+    at any time, and a single group is read from the relation's own order
+    where it has one. Returns a new, union-compatible relation.
+    """
+
+    if size < 0:
+        raise ValueError("Size must be non-negative: %r" % (size,))
+    check_defined(relation, by, 'top_k')
+    if not by:
+        return Ordering(relation, keys).limit(size).to_relation()
+    key, reverse = sort_key(relation, parse_keys(relation, keys))
+    group_key = key_function(relation.tuple._make_projection(*by))
+
+    heaps = {}
+    for tuple_ in relation:
+        group = group_key(tuple_)
+        heap = heaps.get(group)
+        if heap is None:
+            heap = heaps[group] = BoundedHeap(size, key, reverse)
+        heap.push(tuple_)
+
+    new_relation = relation.clone()
+    for heap in heaps.itervalues():
+        new_relation.add_rows(heap.sorted())
+    return new_relation
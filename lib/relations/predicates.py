@@ -0,0 +1,214 @@
+"""
+Declarative predicates for :meth:`Relation.select`.
+
+Predicates built from :class:`Field` are ordinary callables, so they work
+anywhere a lambda does, but they can also be inspected and translated into
+SQL by database-backed relations:
+
+    >>> from relations.predicates import Field
+    >>> employees.select((Field('dept_name') == 'Sales') & (Field('age') > 30))
+"""
+
+import operator
+
+
+__all__ = ['Field', 'Predicate']
+
+
+class Predicate(object):
+
+    """A boolean function of a tuple which can also be rendered as SQL."""
+
+    fields = frozenset()
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    def __call__(self, tuple_):
+        raise NotImplementedError
+
+    def to_sql(self, quote):
+        """Return a ``(sql, parameters)`` pair for use in a WHERE clause."""
+
+        raise NotImplementedError
+
+    def equalities(self):
+
+        """
+        Describe this predicate as a dict of ``{field: value}``, if possible.
+
+        Returns ``None`` unless the predicate is a conjunction of equality
+        tests, which lets relations look matching tuples up directly.
+        """
+
+        return None
+
+
+class Field(object):
+
+    """A reference to a field, for building comparisons against values."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return 'Field(%r)' % (self.name,)
+
+    def __eq__(self, value):
+        return Comparison(self.name, '=', value)
+
+    def __ne__(self, value):
+        return Comparison(self.name, '!=', value)
+
+    def __lt__(self, value):
+        return Comparison(self.name, '<', value)
+
+    def __le__(self, value):
+        return Comparison(self.name, '<=', value)
+
+    def __gt__(self, value):
+        return Comparison(self.name, '>', value)
+
+    def __ge__(self, value):
+        return Comparison(self.name, '>=', value)
+
+    __hash__ = None
+
+    def isin(self, values):
+        """Test whether the field's value is one of the given values."""
+
+        return Membership(self.name, values)
+
+
+class Comparison(Predicate):
+
+    FUNCTIONS = {'=': operator.eq, '!=': operator.ne,
+                 '<': operator.lt, '<=': operator.le,
+                 '>': operator.gt, '>=': operator.ge}
+
+    def __init__(self, field, operator_, value):
+        self.field = field
+        self.operator = operator_
+        self.value = value
+        self.function = self.FUNCTIONS[operator_]
+        self.fields = frozenset([field])
+
+    def __repr__(self):
+        return '(Field(%r) %s %r)' % (self.field, self.operator, self.value)
+
+    def __call__(self, tuple_):
+        return self.function(getattr(tuple_, self.field), self.value)
+
+    def equalities(self):
+        if self.operator == '=':
+            return {self.field: self.value}
+        return None
+
+    # Python 2 orders None before every other value, and compares it
+    # equal only to itself; SQL comparisons with NULL are unknown instead.
+    # Each template spells out the NULL cases so that SQLite selects the
+    # same tuples as calling the predicate would.
+    SQL = {'=': ('{0} IS ?', 1),
+           '!=': ('{0} IS NOT ?', 1),
+           '<': ('({0} < ? OR ({0} IS NULL AND ? IS NOT NULL))', 2),
+           '<=': ('({0} <= ? OR {0} IS NULL)', 1),
+           '>': ('({0} > ? OR ({0} IS NOT NULL AND ? IS NULL))', 2),
+           '>=': ('({0} >= ? OR ? IS NULL)', 2)}
+
+    def to_sql(self, quote):
+        template, parameters = self.SQL[self.operator]
+        return (template.format(quote(self.field)),
+                [self.value] * parameters)
+
+
+class Membership(Predicate):
+
+    def __init__(self, field, values):
+        self.field = field
+        self.values = frozenset(values)
+        self.fields = frozenset([field])
+
+    def __repr__(self):
+        return 'Field(%r).isin(%r)' % (self.field, sorted(self.values))
+
+    def __call__(self, tuple_):
+        return getattr(tuple_, self.field) in self.values
+
+    def to_sql(self, quote):
+        field = quote(self.field)
+        values = [value for value in self.values if value is not None]
+        sql = '%s IN (%s)' % (field, ', '.join('?' * len(values)))
+        # Keep the result true or false, never NULL, as for Comparison.
+        if None in self.values:
+            return '(%s OR %s IS NULL)' % (sql, field), values
+        return '(%s AND %s IS NOT NULL)' % (sql, field), values
+
+
+class And(Predicate):
+
+    keyword = 'AND'
+
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        self.fields = left.fields | right.fields
+
+    def __repr__(self):
+        return '(%r & %r)' % (self.left, self.right)
+
+    def __call__(self, tuple_):
+        return self.left(tuple_) and self.right(tuple_)
+
+    def equalities(self):
+        left = self.left.equalities()
+        right = self.right.equalities()
+        if left is None or right is None:
+            return None
+        for field in set(left).intersection(right):
+            if left[field] != right[field]:
+                return None
+        left.update(right)
+        return left
+
+    def to_sql(self, quote):
+        left_sql, left_params = self.left.to_sql(quote)
+        right_sql, right_params = self.right.to_sql(quote)
+        return ('(%s %s %s)' % (left_sql, self.keyword, right_sql),
+                left_params + right_params)
+
+
+class Or(And):
+
+    keyword = 'OR'
+
+    def __repr__(self):
+        return '(%r | %r)' % (self.left, self.right)
+
+    def __call__(self, tuple_):
+        return self.left(tuple_) or self.right(tuple_)
+
+    def equalities(self):
+        return None
+
+
+class Not(Predicate):
+
+    def __init__(self, predicate):
+        self.predicate = predicate
+        self.fields = predicate.fields
+
+    def __repr__(self):
+        return '~%r' % (self.predicate,)
+
+    def __call__(self, tuple_):
+        return not self.predicate(tuple_)
+
+    def to_sql(self, quote):
+        sql, params = self.predicate.to_sql(quote)
+        return '(NOT %s)' % (sql,), params
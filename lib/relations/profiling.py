@@ -0,0 +1,211 @@
+"""
+Per-operator instrumentation, and EXPLAIN ANALYZE-style query trees.
+
+While at least one hook is registered, each call to an instrumented operator
+(``select``, ``project``, ``rename``, the set operations and their in-place
+forms such as ``|=``, and ``natural_join``) is timed and described by an
+:class:`OperatorCall`, which is passed to every hook. Relations produced by
+instrumented operators remember their call, so the full tree of operators
+behind a result can be printed:
+
+    >>> from relations import profiling
+    >>> with profiling.analyze():
+    ...     result = employees.select(is_manager).natural_join(departments)
+    >>> print profiling.explain(result)
+    natural_join  (rows=2, in=[2, 3], time=0.080 ms, hashed~2, rss=+4 KiB)
+      select  (rows=2, in=[4], time=0.021 ms, hashed~2, rss=+0 KiB)
+        <Relation('dept_name', 'emp_id', 'name')>  (rows=4)
+      <Relation('dept_name', 'manager')>  (rows=3)
+
+Operators called from within other operators are folded into their caller.
+In-place operators return the relation they modified, which keeps whatever
+``profile`` it already had.
+When no hooks are registered an instrumented operator costs one extra
+function call and a truth test.
+"""
+
+from contextlib import contextmanager
+import functools
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+STATM = '/proc/self/statm'
+
+
+__all__ = ['OperatorCall', 'add_hook', 'remove_hook', 'analyze', 'explain']
+
+
+hooks = []
+state = threading.local()
+
+
+def add_hook(hook):
+    """Call ``hook(call)`` with an :class:`OperatorCall` after each operator."""
+
+    hooks.append(hook)
+
+
+def remove_hook(hook):
+    hooks.remove(hook)
+
+
+def current_rss_kb():
+    """The process' current resident memory in KiB, or ``None`` if unknown."""
+
+    if resource is None:
+        return None
+    try:
+        with open(STATM) as statm:
+            pages = int(statm.read().split()[1])
+    except (IOError, OSError, IndexError, ValueError):
+        return None
+    return pages * resource.getpagesize() // 1024
+
+
+class OperatorCall(object):
+
+    """
+    A record of one call to a relational operator.
+
+    ``tuples_hashed`` is an estimate of the hash-table insertions and lookups
+    the operator needed, derived from the cardinalities involved. ``rss_kb``
+    is the change in the process' resident memory over the call, which is
+    roughly the memory held by the result; it is negative if memory was
+    freed, and ``None`` where resident memory can't be read (it is taken
+    from ``/proc/self/statm``).
+    """
+
+    def __init__(self, operator, inputs, input_cardinalities,
+                 output_cardinality, seconds, tuples_hashed, rss_kb):
+        self.operator = operator
+        self.inputs = inputs
+        self.input_cardinalities = input_cardinalities
+        self.output_cardinality = output_cardinality
+        self.seconds = seconds
+        self.tuples_hashed = tuples_hashed
+        self.rss_kb = rss_kb
+
+    def __repr__(self):
+        return '<OperatorCall %s rows=%d>' % (self.operator,
+                                              self.output_cardinality)
+
+    def explain(self, indent=0):
+        """Format this call, and the calls which produced its inputs."""
+
+        rss = 'n/a' if self.rss_kb is None else '%+d KiB' % (self.rss_kb,)
+        lines = ['%s%s  (rows=%d, in=%r, time=%.3f ms, hashed~%d, rss=%s)' % (
+                     '  ' * indent, self.operator, self.output_cardinality,
+                     list(self.input_cardinalities), self.seconds * 1000,
+                     self.tuples_hashed, rss)]
+        for input_, cardinality in zip(self.inputs, self.input_cardinalities):
+            if isinstance(input_, OperatorCall):
+                lines.append(input_.explain(indent + 1))
+            else:
+                lines.append('%s%s  (rows=%d)' % ('  ' * (indent + 1),
+                                                  input_, cardinality))
+        return '\n'.join(lines)
+
+
+def hashes_inputs(inputs, output):
+    return sum(inputs)
+
+
+def hashes_inputs_and_output(inputs, output):
+    return sum(inputs) + output
+
+
+def hashes_smaller_input(inputs, output):
+    return min(inputs) + output
+
+
+def hashes_first_input(inputs, output):
+    return inputs[0]
+
+
+def hashes_output(inputs, output):
+    return output
+
+
+def hashes_nothing(inputs, output):
+    return 0
+
+
+def instrumented(tuples_hashed):
+
+    """
+    Decorate a relational operator so it reports to the registered hooks.
+
+    ``tuples_hashed(input_cardinalities, output_cardinality)`` estimates the
+    number of tuples the operator hashes. Any positional argument with a
+    heading is treated as an input relation.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not hooks or getattr(state, 'active', False):
+                return method(self, *args, **kwargs)
+
+            inputs = (self,) + tuple(arg for arg in args
+                                     if hasattr(arg, 'heading'))
+            cardinalities = [len(input_) for input_ in inputs]
+            rss_before = current_rss_kb()
+            start = time.time()
+            state.active = True
+            try:
+                result = method(self, *args, **kwargs)
+            finally:
+                state.active = False
+            seconds = time.time() - start
+            rss_after = current_rss_kb()
+            output_cardinality = len(result)
+
+            call = OperatorCall(
+                method.__name__,
+                [getattr(input_, 'profile', None) or repr(input_)
+                 for input_ in inputs],
+                cardinalities, output_cardinality, seconds,
+                tuples_hashed(cardinalities, output_cardinality),
+                None if rss_before is None or rss_after is None
+                else rss_after - rss_before)
+            if result is not self:
+                result.profile = call
+            for hook in list(hooks):
+                hook(call)
+            return result
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def analyze():
+
+    """
+    Record every operator call made within a ``with`` block.
+
+    Yields the list of :class:`OperatorCall` objects, which is filled in as
+    operators run.
+    """
+
+    calls = []
+    hook = calls.append
+    add_hook(hook)
+    try:
+        yield calls
+    finally:
+        remove_hook(hook)
+
+
+def explain(relation):
+    """Describe the operators which produced a relation, as a tree."""
+
+    call = getattr(relation, 'profile', None)
+    if call is None:
+        return '%r  (rows=%d, not produced by an instrumented operator)' % (
+            relation, len(relation))
+    return call.explain()
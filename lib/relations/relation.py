@@ -1,9 +1,13 @@
 import functools
-from itertools import imap
+import random
+from itertools import imap, islice
 
 import urecord
 
-from relations.tuple import Tuple
+from relations.profiling import (
+    hashes_first_input, hashes_inputs, hashes_inputs_and_output, hashes_output,
+    hashes_smaller_input, instrumented)
+from relations.tuple import Tuple, key_function
 
 
 __all__ = ['Relation', 'RelationalError', 'UndefinedFields',
@@ -40,6 +44,7 @@ class Relation(object):
         self.heading = frozenset(fields)
         self.tuple = urecord.Record(*sorted(fields), instance=Tuple)
         self.tuples = {}
+        self.sketches = {}
 
     def __repr__(self):
         return '<Relation%r>' % (self.tuple._fields,)
@@ -53,14 +58,115 @@ class Relation(object):
     def __iter__(self):
         return iter(self.tuples)
 
+    def save(self, path):
+        """Write this relation to a file, to be read back with :meth:`open`."""
+
+        from relations import storage
+        storage.save(self, path)
+
+    @classmethod
+    def open(cls, path, mmap=True):
+
+        """
+        Open a relation previously written with :meth:`save`.
+
+        The returned relation reads its tuples lazily from the file (which is
+        memory-mapped unless ``mmap=False`` is given), so opening even a very
+        large relation is cheap.
+        """
+
+        from relations import storage
+        return storage.load(path, mmap=mmap)
+
+    @classmethod
+    def from_csv(cls, file_or_path, fields=None, **kwargs):
+
+        """
+        Read a relation from a CSV file with a header row.
+
+        Rows are streamed from the file and added in chunks; see
+        :func:`relations.formats.read_csv` for the accepted options.
+        """
+
+        from relations import formats
+        return formats.read_csv(file_or_path, fields=fields,
+                                relation_class=cls, **kwargs)
+
+    @classmethod
+    def from_jsonl(cls, file_or_path, fields=None, **kwargs):
+
+        """
+        Read a relation from a file with one JSON object per line.
+
+        Rows are streamed from the file and added in chunks; see
+        :func:`relations.formats.read_jsonl` for the accepted options.
+        """
+
+        from relations import formats
+        return formats.read_jsonl(file_or_path, fields=fields,
+                                  relation_class=cls, **kwargs)
+
+    def to_csv(self, file_or_path, **kwargs):
+        """Write this relation to a CSV file, with a header row."""
+
+        from relations import formats
+        formats.write_csv(self, file_or_path, **kwargs)
+
+    def to_jsonl(self, file_or_path):
+        """Write this relation to a file with one JSON object per line."""
+
+        from relations import formats
+        formats.write_jsonl(self, file_or_path)
+
+    @classmethod
+    def from_arrow(cls, table):
+        """Build a relation from a :class:`pyarrow.Table`."""
+
+        from relations import arrow
+        return arrow.from_arrow(table, relation_class=cls)
+
+    def to_arrow(self):
+
+        """
+        Convert this relation into a :class:`pyarrow.Table`.
+
+        Relations opened from a saved file share their encoded columns with
+        the table rather than decoding every tuple.
+        """
+
+        from relations import arrow
+        return arrow.to_arrow(self)
+
     def clone(self):
         """Create a new, empty relation with the same heading as this one."""
 
         return type(self)(*self.tuple._fields)
 
+    def as_bag(self):
+
+        """
+        Copy this relation's tuples into a :class:`~relations.bag.Bag`.
+
+        Operators on bags don't remove duplicates, which saves hashing every
+        intermediate tuple in a multi-step pipeline; call ``distinct()`` on
+        the final bag to get a relation again.
+        """
+
+        from relations.bag import Bag
+        bag = Bag(*self.tuple._fields)
+        bag.tuples = list(self)
+        return bag
+
     def is_union_compatible(self, other):
         return self.heading == other.heading
 
+    def _members(self):
+        # What the set operations iterate over and probe with ``in`` when
+        # this relation is their other operand. Relations which don't keep
+        # their tuples in memory return something cheaper than ``tuples``.
+        return self.tuples
+
+    @instrumented(hashes_inputs)
     @check_union_compatible
     def update(self, other):
 
@@ -71,35 +177,141 @@ class Relation(object):
         is not modified.
         """
 
+        if self.sketches:
+            self._observe(other)
         self.tuples.update(other.tuples)
         return self
 
+    @instrumented(hashes_inputs)
     @check_union_compatible
     def union(self, other):
         """Safe set union between two union-compatible relations."""
 
         return self.clone().update(self).update(other)
 
+    @instrumented(hashes_smaller_input)
     @check_union_compatible
     def intersection(self, other):
         """Safe set intersection between two union-compatible relations."""
 
+        # Iterate over the smaller operand, probing the larger one.
+        smaller, larger = self.tuples, other._members()
+        if len(larger) < len(smaller):
+            smaller, larger = larger, smaller
+
         new_relation = self.clone()
         new_relation.tuples.update(
-            (tuple_, tuple_) for tuple_ in
-                set(self.tuples).intersection(set(other.tuples)))
+            (tuple_, tuple_) for tuple_ in smaller if tuple_ in larger)
         return new_relation
 
+    @instrumented(hashes_smaller_input)
     @check_union_compatible
     def difference(self, other):
         """Safe set difference between two union-compatible relations."""
 
         new_relation = self.clone()
+        other_tuples = other._members()
+        if len(other_tuples) < len(self.tuples):
+            # Cheaper to copy this relation wholesale and remove the few
+            # tuples of the other one than to probe every tuple of ours.
+            new_relation.tuples = self.tuples.copy()
+            for tuple_ in other_tuples:
+                new_relation.tuples.pop(tuple_, None)
+        else:
+            new_relation.tuples.update(
+                (tuple_, tuple_) for tuple_ in self.tuples
+                if tuple_ not in other_tuples)
+        return new_relation
+
+    @instrumented(hashes_inputs_and_output)
+    @check_union_compatible
+    def symmetric_difference(self, other):
+        """Safe symmetric difference between two union-compatible relations."""
+
+        new_relation = self.clone()
+        other_tuples = other._members()
+        new_relation.tuples.update(
+            (tuple_, tuple_) for tuple_ in self.tuples
+            if tuple_ not in other_tuples)
         new_relation.tuples.update(
-            (tuple_, tuple_) for tuple_ in
-                set(self.tuples).difference(set(other.tuples)))
+            (tuple_, tuple_) for tuple_ in other_tuples
+            if tuple_ not in self.tuples)
         return new_relation
 
+    @instrumented(hashes_smaller_input)
+    @check_union_compatible
+    def intersection_update(self, other):
+
+        """
+        Remove tuples from this relation which are not in the other relation.
+
+        This method modifies (and returns) this relation. The other relation
+        is not modified.
+        """
+
+        other_tuples = other._members()
+        if len(other_tuples) < len(self.tuples):
+            self.tuples = dict((tuple_, self.tuples[tuple_])
+                               for tuple_ in other_tuples
+                               if tuple_ in self.tuples)
+        else:
+            for tuple_ in [candidate for candidate in self.tuples
+                           if candidate not in other_tuples]:
+                del self.tuples[tuple_]
+        return self
+
+    @instrumented(hashes_smaller_input)
+    @check_union_compatible
+    def difference_update(self, other):
+
+        """
+        Remove all tuples in the other relation from this relation.
+
+        This method modifies (and returns) this relation. The other relation
+        is not modified.
+        """
+
+        other_tuples = other._members()
+        if len(other_tuples) < len(self.tuples):
+            for tuple_ in other_tuples:
+                self.tuples.pop(tuple_, None)
+        else:
+            for tuple_ in [candidate for candidate in self.tuples
+                           if candidate in other_tuples]:
+                del self.tuples[tuple_]
+        return self
+
+    @instrumented(hashes_inputs)
+    @check_union_compatible
+    def symmetric_difference_update(self, other):
+
+        """
+        Keep only the tuples which are in exactly one of the two relations.
+
+        This method modifies (and returns) this relation. The other relation
+        is not modified.
+        """
+
+        if self.sketches:
+            # Tuples of the other relation which are already here have been
+            # observed before, and observing them again changes nothing.
+            self._observe(other)
+        for tuple_ in other._members():
+            if tuple_ in self.tuples:
+                del self.tuples[tuple_]
+            else:
+                self.tuples[tuple_] = tuple_
+        return self
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+    __xor__ = symmetric_difference
+    __ior__ = update
+    __iand__ = intersection_update
+    __isub__ = difference_update
+    __ixor__ = symmetric_difference_update
+
     def add(self, **kwargs):
 
         """
@@ -119,8 +331,84 @@ class Relation(object):
         """
 
         tuple_ = self.tuple(**kwargs)
+        if self.sketches:
+            self._observe((tuple_,))
         return self.tuples.setdefault(tuple_, tuple_)
 
+    def add_rows(self, rows):
+
+        """
+        Add many tuples to this relation at once.
+
+        Each row is a sequence of values in the order of ``self.tuple._fields``
+        (i.e. sorted by field name), which avoids building a dictionary of
+        keyword arguments per tuple:
+
+            >>> employees = Relation('name', 'department')
+            >>> employees.add_rows([('Finance', 'Alice'), ('Sales', 'Bob')])
+            >>> employees.contains(name='Bob', department='Sales')
+            True
+        """
+
+        make_tuple = self.tuple
+        tuples = imap(lambda row: make_tuple(*row), rows)
+        if self.sketches:
+            tuples = list(tuples)
+            self._observe(tuples)
+        self.tuples.update((tuple_, tuple_) for tuple_ in tuples)
+
+    def track_distinct(self, *fields, **kwargs):
+
+        """
+        Keep an estimate of the number of distinct values of some fields.
+
+        Creates a :class:`~relations.sketches.HyperLogLog` sketch over the
+        given fields (accepting a ``precision`` keyword argument), fills it
+        from the current tuples, and updates it as tuples are added. The
+        sketch only sees additions, so after tuples are removed it may
+        overestimate. Returns the sketch.
+        """
+
+        from relations.sketches import HyperLogLog
+        check_defined(self, fields, 'track_distinct')
+        fields = tuple(sorted(fields))
+        if fields not in self.sketches:
+            key = key_function(self.tuple._make_projection(*fields))
+            sketch = HyperLogLog(**kwargs)
+            for tuple_ in self:
+                sketch.add(key(tuple_))
+            self.sketches[fields] = (key, sketch)
+        return self.sketches[fields][1]
+
+    def estimate_distinct(self, *fields):
+
+        """
+        Estimate the number of distinct values of some fields.
+
+        Equivalent to ``len(self.project(*fields))``, but in constant memory.
+        Uses the sketch kept by :meth:`track_distinct` if there is one,
+        otherwise builds a sketch in a single pass over the tuples.
+        """
+
+        check_defined(self, fields, 'estimate_distinct')
+        tracked = self.sketches.get(tuple(sorted(fields)))
+        if tracked is not None:
+            return tracked[1].cardinality()
+
+        from relations.sketches import HyperLogLog
+        key = key_function(self.tuple._make_projection(*fields))
+        sketch = HyperLogLog()
+        for tuple_ in self:
+            sketch.add(key(tuple_))
+        return sketch.cardinality()
+
+    def _observe(self, tuples):
+        """Update the tracked sketches with some newly-added tuples."""
+
+        for key, sketch in self.sketches.itervalues():
+            for tuple_ in tuples:
+                sketch.add(key(tuple_))
+
     def contains(self, **kwargs):
 
         """
@@ -140,6 +428,93 @@ class Relation(object):
 
         return self.tuple(**kwargs) in self
 
+    def discard(self, **kwargs):
+
+        """
+        Remove a tuple from this relation, if it's present.
+
+        Arguments are given in the same form as for :meth:`add`. Returns
+        whether a tuple was removed.
+        """
+
+        return self.tuples.pop(self.tuple(**kwargs), None) is not None
+
+    def delete(self, predicate):
+
+        """
+        Remove every tuple matching a predicate from this relation, in place.
+
+        Returns the number of tuples removed. A predicate built from
+        :mod:`relations.predicates` which pins down every field is answered
+        with a single lookup rather than a scan.
+        """
+
+        tuple_ = self._tuple_for(predicate)
+        if tuple_ is not None:
+            return int(self.tuples.pop(tuple_, None) is not None)
+
+        # A dict can't change size while it's iterated over, so the matches
+        # are collected before any is removed.
+        doomed = [candidate for candidate in self.tuples
+                  if predicate(candidate)]
+        for candidate in doomed:
+            del self.tuples[candidate]
+        return len(doomed)
+
+    def update_where(self, predicate, **changes):
+
+        """
+        Change the values of some fields in every tuple matching a predicate.
+
+        Modifies this relation in place, and returns the number of tuples
+        matched. Changed tuples which become equal to each other (or to
+        existing tuples) are merged, as this relation is a set:
+
+            >>> employees.update_where(Field('dept_name') == 'Sales',
+            ...                        dept_name='Marketing')
+            2
+        """
+
+        check_defined(self, changes.keys(), 'update_where')
+        tuple_ = self._tuple_for(predicate)
+        if tuple_ is not None:
+            matched = [tuple_] if tuple_ in self.tuples else []
+        else:
+            matched = [candidate for candidate in self.tuples
+                       if predicate(candidate)]
+
+        change_tuple = self._changer(changes)
+        changed = [change_tuple(match) for match in matched]
+        for match in matched:
+            del self.tuples[match]
+        if self.sketches:
+            self._observe(changed)
+        self.tuples.update((new, new) for new in changed)
+        return len(matched)
+
+    def _tuple_for(self, predicate):
+        """The single tuple a predicate can match, if it names one."""
+
+        equalities = getattr(predicate, 'equalities', lambda: None)()
+        if equalities is not None and set(equalities) == self.heading:
+            return self.tuple(**equalities)
+        return None
+
+    def _changer(self, changes):
+        """Build a function replacing the values of some fields in a tuple."""
+
+        make_tuple = self.tuple
+        positions = [(make_tuple._fields.index(field), value)
+                     for field, value in changes.items()]
+
+        def change_tuple(tuple_):
+            values = list(tuple_)
+            for index, value in positions:
+                values[index] = value
+            return make_tuple(*values)
+        return change_tuple
+
+    @instrumented(hashes_output)
     def select(self, predicate):
 
         """
@@ -153,6 +528,7 @@ class Relation(object):
             (tuple_, tuple_) for tuple_ in filter(predicate, self.tuples))
         return new_relation
 
+    @instrumented(hashes_first_input)
     def project(self, *fields):
 
         """
@@ -174,20 +550,15 @@ class Relation(object):
             True
         """
 
+        check_defined(self, fields, 'project')
         new_relation = type(self)(*fields)
-        if not new_relation.heading.issubset(self.heading):
-            undefined_fields = tuple(new_relation.heading.difference(self.heading))
-            raise UndefinedFields("Undefined fields used in project(): %r" %
-                                  undefined_fields)
-
-        projection = self.tuple._make_projection(*fields)
-
+        projection = self.tuple._make_projection(*new_relation.tuple._fields)
+        project_tuple = new_relation.tuple._projector(projection)
         new_relation.tuples.update((tuple_, tuple_)
-            for tuple_ in imap(
-                lambda t: new_relation.tuple(*t._index_restrict(*projection)),
-                self.tuples))
+            for tuple_ in imap(project_tuple, self.tuples))
         return new_relation
 
+    @instrumented(hashes_first_input)
     def rename(self, **new_fields):
 
         """
@@ -198,41 +569,231 @@ class Relation(object):
         only be union-compatible if no arguments are given to this function.
         """
 
-        if not is_bijection(new_fields):
-            raise RelationalError("Field mapping is not one-to-one")
-        elif not set(new_fields.values()).issubset(self.heading):
-            undefined_fields = tuple(set(new_fields.values()).difference(self.heading))
-            raise UndefinedFields("Undefined fields used in rename(): %r" %
-                                  undefined_fields)
-
-        # Get a complete bijection from new field names => old field names
-        renamed_fields = set(new_fields.values())
-        for field_name in self.heading:
-            if field_name not in renamed_fields:
-                new_fields[field_name] = field_name
-
+        new_fields = complete_renaming(self, new_fields)
         new_relation = type(self)(*new_fields.keys())
         reordering = self.tuple._make_reordering(**new_fields)
+        rename_tuple = new_relation.tuple._projector(reordering)
         new_relation.tuples.update(
-            (tuple_, tuple_) for tuple_ in imap(
-                lambda t: new_relation.tuple(*t._index_restrict(*reordering)),
-                self.tuples))
+            (tuple_, tuple_) for tuple_ in imap(rename_tuple, self.tuples))
         return new_relation
 
+    @instrumented(hashes_output)
+    def sample(self, size, seed=None):
+
+        """
+        Return a new relation of tuples sampled uniformly from this one.
+
+        ``size`` is either a number of tuples, or (if a float) a fraction of
+        this relation's cardinality. The sample is taken with a reservoir in
+        one pass, holding only the sampled tuples. Pass ``seed`` for a
+        repeatable sample.
+        """
+
+        from relations.sketches import reservoir_sample
+        if isinstance(size, float):
+            if not 0 <= size <= 1:
+                raise ValueError("Sample fraction must be between 0 and 1")
+            size = int(round(size * len(self)))
+        new_relation = self.clone()
+        new_relation.add_rows(
+            reservoir_sample(self, size, random.Random(seed)))
+        return new_relation
+
+    def order_by(self, *keys):
+
+        """
+        Return the tuples of this relation in order, as an :class:`Ordering`.
+
+        Keys are field names, prefixed with ``-`` for descending order. The
+        ordering is computed lazily, and taking a limit of it only keeps that
+        many tuples in memory:
+
+            >>> for emp in employees.order_by('-salary').limit(3):
+            ...     print emp.name
+        """
+
+        from relations.ordering import Ordering
+        return Ordering(self, keys)
+
+    @instrumented(hashes_output)
+    def limit(self, size):
+
+        """
+        Return a new relation with at most ``size`` tuples from this one.
+
+        Which tuples are kept is arbitrary; use ``order_by(...).limit(size)``
+        for the first tuples in a particular order.
+        """
+
+        new_relation = self.clone()
+        new_relation.add_rows(islice(self, size))
+        return new_relation
+
+    @instrumented(hashes_output)
+    def top_k(self, size, key, by=()):
+
+        """
+        Select the first ``size`` tuples by ``key`` within each group.
+
+        ``key`` is a sort key (or list of keys) as for :meth:`order_by`, and
+        groups are the distinct values of the ``by`` fields. For the three
+        best-paid employees in each department:
+
+            >>> employees.top_k(3, '-salary', by=['dept_name'])
+
+        Returns a new, union-compatible relation.
+        """
+
+        from relations import ordering
+        return ordering.top_k(self, size, key, by=by)
+
+    def _ordered_iter(self, keys):
+
+        """
+        Iterate over this relation's tuples in a given order, if that's cheap.
+
+        ``keys`` is a list of ``(field, descending)`` pairs. Relations which
+        keep an ordered index return an iterator here; the default of
+        ``None`` means the tuples must be sorted.
+        """
+
+        return None
+
+    @instrumented(hashes_inputs_and_output)
     def natural_join(self, other):
+
+        """
+        Join this relation with another on all the fields they share.
+
+        This is a hash join: the smaller relation is indexed on the shared
+        fields, and the larger one probes that index. Relations with no
+        fields in common produce their cartesian product.
+        """
+
         new_relation = type(self)(*self.heading.union(other.heading))
-        common_fields = self.heading.intersection(other.heading)
-        projection1 = self.tuple._make_projection(*common_fields)
-        projection2 = other.tuple._make_projection(*common_fields)
-        for tuple1 in self:
-            for tuple2 in other:
-                if (tuple1._index_restrict(*projection1) ==
-                    tuple2._index_restrict(*projection2)):
-                    row = tuple1._asdict()
-                    row.update(tuple2._asdict())
-                    new_relation.add(**row)
+        tuples = new_relation.tuples
+        for tuple_ in self._joined(other, new_relation.tuple):
+            tuples[tuple_] = tuple_
         return new_relation
 
+    def _joined(self, other, make_tuple):
+        # Generate the natural join of two relations, as ``make_tuple``s.
+        common_fields = sorted(self.heading.intersection(other.heading))
+
+        # Build the index over the smaller relation, but always merge rows as
+        # (tuple from self, tuple from other).
+        if len(other) <= len(self):
+            build, probe, swapped = other, self, False
+        else:
+            build, probe, swapped = self, other, True
+        build_key = key_function(build.tuple._make_projection(*common_fields))
+        probe_key = key_function(probe.tuple._make_projection(*common_fields))
+        index = {}
+        for tuple_ in build:
+            index.setdefault(build_key(tuple_), []).append(tuple_)
+
+        merge_tuple = make_tuple._merger(
+            [(0, self.tuple._fields.index(field)) if field in self.heading
+             else (1, other.tuple._fields.index(field))
+             for field in make_tuple._fields])
+        for probe_tuple in probe:
+            matches = index.get(probe_key(probe_tuple))
+            if matches:
+                for build_tuple in matches:
+                    if swapped:
+                        yield merge_tuple(build_tuple, probe_tuple)
+                    else:
+                        yield merge_tuple(probe_tuple, build_tuple)
+
+    @instrumented(hashes_inputs)
+    def semijoin(self, other):
+
+        """
+        Select the tuples of this relation which join with the other.
+
+        Returns a new, union-compatible relation holding the tuples which
+        match at least one tuple of ``other`` on their shared fields.
+        """
+
+        common_fields = sorted(self.heading.intersection(other.heading))
+        self_key = key_function(self.tuple._make_projection(*common_fields))
+        other_key = key_function(other.tuple._make_projection(*common_fields))
+        keys = set(imap(other_key, other))
+
+        new_relation = self.clone()
+        new_relation.add_rows(tuple_ for tuple_ in self
+                              if self_key(tuple_) in keys)
+        return new_relation
+
+    def bloom_filter(self, *fields, **kwargs):
+
+        """
+        Build a Bloom filter of this relation's values for the given fields.
+
+        Accepts an ``error_rate`` keyword argument (the false positive rate,
+        by default 1%). The filter can be serialized with ``to_bytes()`` and
+        passed to :meth:`prefilter` on another relation, e.g. one partition of
+        a larger relation in another process, so that only the tuples which
+        might join need to be sent back. Within one process a join's own hash
+        lookups are already cheaper than checking a filter first.
+        """
+
+        from relations.bloom import BloomFilter
+        check_defined(self, fields, 'bloom_filter')
+        key = key_function(self.tuple._make_projection(*fields))
+        filter_ = BloomFilter(fields, len(self), **kwargs)
+        for tuple_ in self:
+            filter_.add(key(tuple_))
+        return filter_
+
+    @instrumented(hashes_output)
+    def prefilter(self, bloom_filter):
+
+        """
+        Discard tuples whose values can't be in a Bloom filter.
+
+        Returns a new, union-compatible relation of the tuples which might
+        match a key in the filter (built by :meth:`bloom_filter`); false
+        positives are possible, so an exact join must still follow.
+        """
+
+        check_defined(self, bloom_filter.fields, 'prefilter')
+        key = key_function(self.tuple._make_projection(*bloom_filter.fields))
+        new_relation = self.clone()
+        new_relation.add_rows(tuple_ for tuple_ in self
+                              if key(tuple_) in bloom_filter)
+        return new_relation
+
+
+def check_defined(relation, fields, operation):
+    """Raise :class:`UndefinedFields` if any field is not in the heading."""
+
+    undefined_fields = tuple(set(fields).difference(relation.heading))
+    if undefined_fields:
+        raise UndefinedFields("Undefined fields used in %s(): %r" %
+                              (operation, undefined_fields))
+
+
+def complete_renaming(relation, new_fields):
+
+    """
+    Validate the arguments to :meth:`Relation.rename`.
+
+    Returns a complete bijection from new field names to old field names,
+    with every field not mentioned mapping to itself.
+    """
+
+    if not is_bijection(new_fields):
+        raise RelationalError("Field mapping is not one-to-one")
+    check_defined(relation, new_fields.values(), 'rename')
+
+    renaming = dict(new_fields)
+    renamed_fields = set(new_fields.values())
+    for field_name in relation.heading:
+        if field_name not in renamed_fields:
+            renaming[field_name] = field_name
+    return renaming
+
 
 def is_bijection(dictionary):
     """Check if a dictionary is a proper one-to-one mapping."""
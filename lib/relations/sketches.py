@@ -0,0 +1,104 @@
+"""
+Constant-memory summaries of relations: distinct counts and samples.
+
+:class:`HyperLogLog` estimates the number of distinct values it has seen
+(typically within a couple of percent) using ``2 ** precision`` bytes, and
+sketches of separate relations or partitions can be merged. Relations can
+keep sketches up to date as tuples are added; see
+:meth:`Relation.track_distinct`.
+"""
+
+import math
+import random
+import struct
+
+from relations.hashing import digest
+
+
+__all__ = ['HyperLogLog', 'reservoir_sample']
+
+
+def hash64(value):
+    """A 64-bit hash of a value, the same in every process."""
+
+    return struct.unpack('<Q', digest(value)[:8])[0]
+
+
+class HyperLogLog(object):
+
+    """
+    A HyperLogLog sketch for estimating the number of distinct values.
+
+    ``precision`` (between 4 and 16) sets the number of registers to
+    ``2 ** precision``; the standard error is about
+    ``1.04 / sqrt(2 ** precision)``, or 1.6% at the default of 12.
+    """
+
+    def __init__(self, precision=12):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def __repr__(self):
+        return '<HyperLogLog precision=%d estimate=%d>' % (
+            self.precision, self.cardinality())
+
+    def add(self, value):
+        hashed = hash64(value)
+        precision = self.precision
+        index = hashed >> (64 - precision)
+        remainder = (hashed << precision) & 0xFFFFFFFFFFFFFFFF
+        rank = min(64 - remainder.bit_length(), 64 - precision) + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def cardinality(self):
+        """Estimate the number of distinct values added so far."""
+
+        registers = self.registers
+        size = len(registers)
+        if size >= 128:
+            alpha = 0.7213 / (1 + 1.079 / size)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[size]
+        estimate = alpha * size * size / sum(2.0 ** -rank
+                                             for rank in registers)
+        zeros = registers.count('\x00')
+        if zeros and estimate <= 2.5 * size:
+            # Linear counting is more accurate for small cardinalities.
+            estimate = size * math.log(float(size) / zeros)
+        return int(round(estimate))
+
+    def update(self, other):
+
+        """
+        Merge another sketch of the same precision into this one.
+
+        Afterwards this sketch estimates the distinct values of both.
+        """
+
+        if other.precision != self.precision:
+            raise ValueError("Can't merge sketches of different precisions")
+        self.registers = bytearray(max(a, b) for a, b in
+                                   zip(self.registers, other.registers))
+        return self
+
+
+def reservoir_sample(iterable, size, rng=random):
+
+    """
+    Choose ``size`` items uniformly at random from an iterable, in one pass.
+
+    Holds at most ``size`` items at a time (Vitter's Algorithm R).
+    """
+
+    reservoir = []
+    for seen, item in enumerate(iterable):
+        if seen < size:
+            reservoir.append(item)
+        else:
+            replace = rng.randint(0, seen)
+            if replace < size:
+                reservoir[replace] = item
+    return reservoir
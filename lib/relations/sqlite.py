@@ -0,0 +1,499 @@
+"""
+A relation stored in a SQLite database.
+
+:class:`SQLiteRelation` has the same interface as :class:`Relation`, but keeps
+its tuples in a table, so it can hold more data than fits in memory. The
+relational operators are translated into SQL and run inside SQLite; relations
+derived from one another share a connection, with intermediate results held
+in temporary tables. Selections using :mod:`relations.predicates` become
+WHERE clauses, while arbitrary Python predicates are evaluated as the rows
+stream past.
+
+Python 2's :mod:`sqlite3` commits any open transaction before creating or
+dropping a table, which operators (and garbage collection of their results)
+do. Changes can't be rolled back once another operator has run, so treat
+every operator as a commit point.
+"""
+
+from contextlib import contextmanager
+from itertools import count
+import sqlite3
+
+from relations.profiling import (
+    hashes_first_input, hashes_inputs, hashes_inputs_and_output,
+    hashes_output, hashes_smaller_input, instrumented)
+from relations.relation import (Relation, check_defined, check_union_compatible,
+                                complete_renaming)
+
+
+__all__ = ['SQLiteRelation']
+
+
+table_counter = count()
+
+
+def quote(identifier):
+    """Quote a table or column name for use in SQL."""
+
+    return '"%s"' % (identifier.replace('"', '""'),)
+
+
+class SQLiteRelation(Relation):
+
+    """
+    A relation whose tuples are stored in a SQLite table.
+
+    ``database`` may be a path or an existing :class:`sqlite3.Connection`;
+    it defaults to a private in-memory database. If ``table`` is given the
+    tuples are kept in (and any existing tuples read from) that table in the
+    main database; otherwise a temporary table is used, which is dropped by
+    :meth:`close` or when the relation is garbage-collected.
+
+    Connections opened here may be used from any thread, though only by one
+    at a time (as when an :class:`~relations.ingest.Ingester` adds tuples on
+    its worker thread).
+
+        >>> employees = SQLiteRelation('name', 'dept_name',
+        ...                            database='company.db', table='employees')
+    """
+
+    def __init__(self, *fields, **kwargs):
+        database = kwargs.pop('database', None)
+        table = kwargs.pop('table', None)
+        super(SQLiteRelation, self).__init__(*fields, **kwargs)
+
+        if isinstance(database, sqlite3.Connection):
+            self.connection = database
+        else:
+            self.connection = sqlite3.connect(database or ':memory:',
+                                              check_same_thread=False)
+
+        self.columns = ', '.join(quote(field) for field in self.tuple._fields)
+        self.temporary = table is None
+        if self.temporary:
+            self.table = 'relation_%d' % (next(table_counter),)
+            create = 'CREATE TEMP TABLE'
+        else:
+            self.table = table
+            create = 'CREATE TABLE IF NOT EXISTS'
+        self._create_table(create, self.table)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            # The connection may be closed, or the table still being read.
+            pass
+
+    def _create_table(self, create, table):
+        if self.tuple._fields:
+            self.connection.execute('%s %s (%s, UNIQUE (%s))' % (
+                create, quote(table), self.columns, self.columns))
+            # UNIQUE treats NULLs as distinct from each other, so on its own
+            # it would let a tuple holding None in twice. This index tags
+            # each NULL instead, making it unique the way Python's None is;
+            # the plain constraint stays to serve lookups by value.
+            self.connection.execute(
+                'CREATE UNIQUE INDEX IF NOT EXISTS %s ON %s (%s)' % (
+                    quote(table + '_distinct'), quote(table),
+                    ', '.join('IFNULL(%s, 0), %s IS NULL' % (
+                        quote(field), quote(field))
+                        for field in self.tuple._fields)))
+        else:
+            # A relation with no fields holds at most the empty tuple.
+            self.connection.execute('%s %s (present UNIQUE)' % (
+                create, quote(table)))
+
+    @property
+    def tuples(self):
+
+        """
+        A dictionary of all the tuples in this relation.
+
+        This reads the whole table into memory; it exists for compatibility
+        with code written against :class:`Relation`.
+        """
+
+        return dict((tuple_, tuple_) for tuple_ in self)
+
+    @tuples.setter
+    def tuples(self, tuples):
+        if tuples:
+            raise TypeError("SQLiteRelation tuples can't be assigned directly")
+
+    def commit(self):
+
+        """
+        Commit any changes to the underlying database.
+
+        Changes made since the last operator call are only durable once
+        this is called; earlier ones have already been committed (see the
+        module documentation).
+        """
+
+        self.connection.commit()
+
+    def close(self):
+
+        """
+        Drop this relation's temporary table, if it has one.
+
+        The relation can't be used afterwards. Relations stored in a named
+        table are left as they are.
+        """
+
+        if self.temporary:
+            self.temporary = False
+            self._execute('DROP TABLE IF EXISTS %s' % (quote(self.table),))
+
+    def _execute(self, sql, params=()):
+        return self.connection.execute(sql, params)
+
+    def _select_all(self, table=None):
+        if not self.tuple._fields:
+            return 'SELECT present FROM %s' % (quote(table or self.table),)
+        return 'SELECT %s FROM %s' % (self.columns, quote(table or self.table))
+
+    def _insert(self, or_ignore=True):
+        return 'INSERT %sINTO %s VALUES (%s)' % (
+            'OR IGNORE ' if or_ignore else '', quote(self.table),
+            ', '.join('?' * (len(self.tuple._fields) or 1)))
+
+    def _match(self, left, right):
+        """SQL matching every column of two tables, treating NULLs as equal."""
+
+        if not self.tuple._fields:
+            return '1'
+        return ' AND '.join('%s.%s IS %s.%s' % (left, quote(field),
+                                               right, quote(field))
+                            for field in self.tuple._fields)
+
+    @contextmanager
+    def _table_for(self, other):
+
+        """
+        Get the name of a table holding the tuples of another relation.
+
+        Relations on the same connection are used directly; anything else is
+        streamed into a temporary table, which is dropped on leaving the
+        ``with`` block.
+        """
+
+        if (isinstance(other, SQLiteRelation) and
+                other.connection is self.connection):
+            yield other.table
+            return
+        copy = SQLiteRelation(*other.tuple._fields, database=self.connection)
+        try:
+            copy.add_rows(other)
+            yield copy.table
+        finally:
+            copy.close()
+
+    def _members(self):
+        # Probe the table through its index rather than reading it all.
+        return self
+
+    def _is_smaller_foreign(self, other):
+        return (not isinstance(other, SQLiteRelation) and
+                len(self) <= len(other))
+
+    def __len__(self):
+        return self._execute(
+            'SELECT COUNT(*) FROM %s' % (quote(self.table),)).fetchone()[0]
+
+    def __contains__(self, tuple_):
+        if not self.tuple._fields:
+            return len(self) > 0
+        where = ' AND '.join('%s IS ?' % (quote(field),)
+                             for field in self.tuple._fields)
+        return self._execute('SELECT 1 FROM %s WHERE %s LIMIT 1' % (
+            quote(self.table), where), tuple(tuple_)).fetchone() is not None
+
+    def __iter__(self):
+        make_tuple = self.tuple
+        for row in self._execute(self._select_all()):
+            yield make_tuple(*row[:len(make_tuple._fields)])
+
+    def _ordered_iter(self, keys):
+        # SQLite sorts (using the table's index where it can), and the
+        # cursor is only read as far as the caller needs.
+        # A generator, so the relation (and its table) outlives the cursor.
+        make_tuple = self.tuple
+        order = ', '.join(quote(field) + (' DESC' if descending else '')
+                          for field, descending in keys)
+        for row in self._execute('%s ORDER BY %s' % (self._select_all(),
+                                                     order)):
+            yield make_tuple(*row)
+
+    def clone(self):
+        return type(self)(*self.tuple._fields, database=self.connection)
+
+    def add(self, **kwargs):
+        tuple_ = self.tuple(**kwargs)
+        if self.sketches:
+            self._observe((tuple_,))
+        self._execute(self._insert(), tuple(tuple_) or (1,))
+        return tuple_
+
+    def add_rows(self, rows):
+        if self.sketches:
+            make_tuple = self.tuple
+            rows = [make_tuple(*row) for row in rows]
+            self._observe(rows)
+        if not self.tuple._fields:
+            rows = (row or (1,) for row in rows)
+        self.connection.executemany(self._insert(), (tuple(row) for row in rows))
+
+    @instrumented(hashes_inputs)
+    @check_union_compatible
+    def update(self, other):
+        if self.sketches:
+            self._observe(other)
+        with self._table_for(other) as other_table:
+            self._execute('INSERT OR IGNORE INTO %s %s' % (
+                quote(self.table), self._select_all(other_table)))
+        return self
+
+    @instrumented(hashes_smaller_input)
+    @check_union_compatible
+    def intersection(self, other):
+        new_relation = self.clone()
+        if self._is_smaller_foreign(other):
+            other_tuples = other._members()
+            new_relation.add_rows(tuple_ for tuple_ in self
+                                  if tuple_ in other_tuples)
+        else:
+            with self._table_for(other) as other_table:
+                new_relation._execute('INSERT INTO %s %s INTERSECT %s' % (
+                    quote(new_relation.table), self._select_all(),
+                    self._select_all(other_table)))
+        return new_relation
+
+    @instrumented(hashes_smaller_input)
+    @check_union_compatible
+    def difference(self, other):
+        new_relation = self.clone()
+        if self._is_smaller_foreign(other):
+            other_tuples = other._members()
+            new_relation.add_rows(tuple_ for tuple_ in self
+                                  if tuple_ not in other_tuples)
+        else:
+            with self._table_for(other) as other_table:
+                new_relation._execute('INSERT INTO %s %s EXCEPT %s' % (
+                    quote(new_relation.table), self._select_all(),
+                    self._select_all(other_table)))
+        return new_relation
+
+    @instrumented(hashes_inputs_and_output)
+    @check_union_compatible
+    def symmetric_difference(self, other):
+        new_relation = self.clone()
+        with self._table_for(other) as other_table:
+            new_relation._execute(
+                'INSERT INTO %s SELECT * FROM (%s EXCEPT %s) '
+                'UNION ALL SELECT * FROM (%s EXCEPT %s)' % (
+                    quote(new_relation.table),
+                    self._select_all(), self._select_all(other_table),
+                    self._select_all(other_table), self._select_all()))
+        return new_relation
+
+    @instrumented(hashes_smaller_input)
+    @check_union_compatible
+    def intersection_update(self, other):
+        with self._table_for(other) as other_table:
+            self._execute(
+                'DELETE FROM %s WHERE NOT EXISTS '
+                '(SELECT 1 FROM %s WHERE %s)' % (
+                    quote(self.table), quote(other_table),
+                    self._match(quote(self.table), quote(other_table))))
+        return self
+
+    @instrumented(hashes_smaller_input)
+    @check_union_compatible
+    def difference_update(self, other):
+        with self._table_for(other) as other_table:
+            self._execute(
+                'DELETE FROM %s WHERE EXISTS (SELECT 1 FROM %s WHERE %s)' % (
+                    quote(self.table), quote(other_table),
+                    self._match(quote(self.table), quote(other_table))))
+        return self
+
+    @instrumented(hashes_inputs)
+    @check_union_compatible
+    def symmetric_difference_update(self, other):
+        if self.sketches:
+            self._observe(other)
+        result = self.symmetric_difference(other)
+        self._execute('DELETE FROM %s' % (quote(self.table),))
+        self._execute('INSERT INTO %s %s' % (
+            quote(self.table), self._select_all(result.table)))
+        result.close()
+        return self
+
+    __and__ = intersection
+    __sub__ = difference
+    __xor__ = symmetric_difference
+    __ior__ = update
+    __iand__ = intersection_update
+    __isub__ = difference_update
+    __ixor__ = symmetric_difference_update
+
+    def discard(self, **kwargs):
+        tuple_ = self.tuple(**kwargs)
+        if not self.tuple._fields:
+            where, params = '1', ()
+        else:
+            where = ' AND '.join('%s IS ?' % (quote(field),)
+                                 for field in self.tuple._fields)
+            params = tuple(tuple_)
+        return self._execute('DELETE FROM %s WHERE %s' % (
+            quote(self.table), where), params).rowcount > 0
+
+    def delete(self, predicate):
+
+        """
+        Remove every tuple matching a predicate from this relation, in place.
+
+        Predicates built with :mod:`relations.predicates` become a single
+        DELETE statement, using the table's index where SQLite can; other
+        callables are applied to each tuple, and the rowids of the matches
+        collected (SQLite can't safely modify a table under an open cursor)
+        then deleted with a single ``executemany()``.
+        """
+
+        if hasattr(predicate, 'to_sql'):
+            check_defined(self, predicate.fields, 'delete')
+            where, params = predicate.to_sql(quote)
+            return self._execute('DELETE FROM %s WHERE %s' % (
+                quote(self.table), where), params).rowcount
+
+        rowids = self._matching_rowids(predicate)
+        self.connection.executemany(
+            'DELETE FROM %s WHERE rowid = ?' % (quote(self.table),),
+            ((rowid,) for rowid in rowids))
+        return len(rowids)
+
+    def update_where(self, predicate, **changes):
+
+        """
+        Change the values of some fields in every tuple matching a predicate.
+
+        As for :meth:`delete`, predicates from :mod:`relations.predicates`
+        run as a single UPDATE. Changed tuples which collide with existing
+        ones replace them, so the relation remains a set.
+        """
+
+        check_defined(self, changes.keys(), 'update_where')
+        if not changes:
+            return len(self.select(predicate))
+        fields = sorted(changes)
+        assignments = ', '.join('%s = ?' % (quote(field),) for field in fields)
+        values = [changes[field] for field in fields]
+
+        if self.sketches:
+            change_tuple = self._changer(changes)
+            self._observe([change_tuple(tuple_)
+                           for tuple_ in self.select(predicate)])
+
+        if hasattr(predicate, 'to_sql'):
+            check_defined(self, predicate.fields, 'update_where')
+            where, params = predicate.to_sql(quote)
+            return self._execute('UPDATE OR REPLACE %s SET %s WHERE %s' % (
+                quote(self.table), assignments, where),
+                values + list(params)).rowcount
+
+        rowids = self._matching_rowids(predicate)
+        self.connection.executemany(
+            'UPDATE OR REPLACE %s SET %s WHERE rowid = ?' % (
+                quote(self.table), assignments),
+            (values + [rowid] for rowid in rowids))
+        return len(rowids)
+
+    def _matching_rowids(self, predicate):
+        # Collected up front, since SQLite can't safely modify a table while
+        # a cursor over it is open.
+        make_tuple = self.tuple
+        width = len(make_tuple._fields)
+        return [row[0] for row in self._execute(
+                    'SELECT rowid, %s FROM %s' % (
+                        self.columns or 'present', quote(self.table)))
+                if predicate(make_tuple(*row[1:width + 1]))]
+
+    @instrumented(hashes_output)
+    def select(self, predicate):
+
+        """
+        Filter the tuples in this relation based on a predicate.
+
+        Predicates built with :mod:`relations.predicates` run as SQL; any
+        other callable is applied to each tuple as it's read.
+        """
+
+        new_relation = self.clone()
+        if hasattr(predicate, 'to_sql'):
+            check_defined(self, predicate.fields, 'select')
+            where, params = predicate.to_sql(quote)
+            new_relation._execute('INSERT INTO %s %s WHERE %s' % (
+                quote(new_relation.table), self._select_all(), where), params)
+        else:
+            new_relation.add_rows(tuple_ for tuple_ in self
+                                  if predicate(tuple_))
+        return new_relation
+
+    @instrumented(hashes_first_input)
+    def project(self, *fields):
+        check_defined(self, fields, 'project')
+        new_relation = type(self)(*fields, database=self.connection)
+        if fields:
+            new_relation._execute('INSERT INTO %s SELECT DISTINCT %s FROM %s' % (
+                quote(new_relation.table), new_relation.columns,
+                quote(self.table)))
+        elif len(self):
+            new_relation.add_rows([()])
+        return new_relation
+    project.__doc__ = Relation.project.__doc__
+
+    @instrumented(hashes_first_input)
+    def rename(self, **new_fields):
+        new_fields = complete_renaming(self, new_fields)
+        new_relation = type(self)(*new_fields.keys(), database=self.connection)
+        if new_fields:
+            new_relation._execute('INSERT INTO %s SELECT %s FROM %s' % (
+                quote(new_relation.table),
+                ', '.join(quote(new_fields[field])
+                          for field in new_relation.tuple._fields),
+                quote(self.table)))
+        else:
+            new_relation.update(self)
+        return new_relation
+    rename.__doc__ = Relation.rename.__doc__
+
+    @instrumented(hashes_output)
+    def natural_join(self, other):
+        new_relation = type(self)(*self.heading.union(other.heading),
+                                  database=self.connection)
+        if not new_relation.tuple._fields:
+            if len(self) and len(other):
+                new_relation.add_rows([()])
+            return new_relation
+        if self._is_smaller_foreign(other):
+            # Stream this relation past the larger in-memory one, rather
+            # than copying that into SQLite.
+            new_relation.add_rows(self._joined(other, new_relation.tuple))
+            return new_relation
+
+        columns = ', '.join(
+            '%s.%s' % ('a' if field in self.heading else 'b', quote(field))
+            for field in new_relation.tuple._fields)
+        condition = ' AND '.join(
+            'a.%s IS b.%s' % (quote(field), quote(field))
+            for field in sorted(self.heading.intersection(other.heading)))
+        with self._table_for(other) as other_table:
+            new_relation._execute(
+                'INSERT OR IGNORE INTO %s SELECT %s FROM %s AS a '
+                'JOIN %s AS b%s' % (
+                    quote(new_relation.table), columns, quote(self.table),
+                    quote(other_table),
+                    ' ON ' + condition if condition else ''))
+        return new_relation
@@ -0,0 +1,271 @@
+"""
+A columnar binary file format for relations.
+
+The layout of a saved relation is::
+
+    MAGIC
+    dictionary block (pickled, sorted list of distinct values) per field
+    code block (array of 32-bit little-endian codes, one per tuple) per field
+    header (pickled dict of fields, cardinality and block offsets)
+    footer (8-byte little-endian offset of the header)
+
+Each value is replaced by its position in its field's dictionary, and tuples
+are written in sorted order of their codes. That order doubles as a
+persisted index on the whole tuple, so membership tests are a binary search
+over the file rather than a scan, and nothing but the dictionaries has to be
+deserialized when a relation is opened.
+"""
+
+from array import array
+from itertools import izip
+from mmap import mmap as memory_map, ACCESS_READ
+import cPickle as pickle
+import struct
+import sys
+
+from relations.profiling import hashes_output, instrumented
+from relations.relation import (Relation, RelationalError,
+                                check_defined)
+
+
+__all__ = ['save', 'load', 'MappedRelation', 'InvalidRelationFile']
+
+
+MAGIC = 'RELATION\x00\x01'
+FOOTER = struct.Struct('<Q')
+CODE = struct.Struct('<I')
+CODE_TYPE = 'I' if array('I').itemsize == CODE.size else 'L'
+CHUNK_SIZE = 4096
+
+
+class InvalidRelationFile(RelationalError):
+    """A file could not be read as a saved relation."""
+    pass
+
+
+def save(relation, path):
+
+    """
+    Write a relation to a file in the columnar binary format.
+
+    The relation can be read back with :func:`load`.
+    """
+
+    fields = relation.tuple._fields
+    dictionaries = [sorted(set(column))
+                    for column in columns(relation.tuples, len(fields))]
+    positions = [dict((value, code) for code, value in enumerate(values))
+                 for values in dictionaries]
+    rows = sorted(tuple(position[value]
+                        for position, value in izip(positions, tuple_))
+                  for tuple_ in relation.tuples)
+
+    with open(path, 'wb') as file_:
+        file_.write(MAGIC)
+        dictionary_blocks = []
+        for values in dictionaries:
+            data = pickle.dumps(values, pickle.HIGHEST_PROTOCOL)
+            dictionary_blocks.append((file_.tell(), len(data)))
+            file_.write(data)
+
+        code_blocks = []
+        for codes in columns(rows, len(fields)):
+            codes = array(CODE_TYPE, codes)
+            if sys.byteorder == 'big':
+                codes.byteswap()
+            code_blocks.append(file_.tell())
+            file_.write(codes.tostring())
+
+        header_offset = file_.tell()
+        file_.write(pickle.dumps({'fields': fields,
+                                  'cardinality': len(rows),
+                                  'dictionaries': dictionary_blocks,
+                                  'codes': code_blocks},
+                                 pickle.HIGHEST_PROTOCOL))
+        file_.write(FOOTER.pack(header_offset))
+
+
+def load(path, mmap=True):
+
+    """
+    Open a relation previously written with :func:`save`.
+
+    With ``mmap=True`` (the default) the file is memory-mapped, and tuples are
+    decoded from it only as they're needed. Otherwise the file's contents are
+    read into memory, but are still decoded lazily.
+    """
+
+    with open(path, 'rb') as file_:
+        if mmap:
+            buffer_ = memory_map(file_.fileno(), 0, access=ACCESS_READ)
+        else:
+            buffer_ = file_.read()
+
+    if (len(buffer_) < len(MAGIC) + FOOTER.size or
+            buffer_[:len(MAGIC)] != MAGIC):
+        raise InvalidRelationFile("Not a saved relation: %r" % (path,))
+
+    header_offset, = FOOTER.unpack_from(buffer_, len(buffer_) - FOOTER.size)
+    header = pickle.loads(buffer_[header_offset:-FOOTER.size])
+    dictionaries = [pickle.loads(buffer_[offset:offset + length])
+                    for offset, length in header['dictionaries']]
+    return MappedRelation(*header['fields'],
+                          source=(buffer_, header['cardinality'],
+                                  dictionaries, header['codes']))
+
+
+def columns(rows, width):
+    """Transpose an iterable of rows into a list of columns."""
+
+    if not width:
+        return []
+    transposed = zip(*rows)
+    return transposed or [() for _ in xrange(width)]
+
+
+class MappedRelation(Relation):
+
+    """
+    A relation backed by a file written with :func:`save`.
+
+    Cardinality, membership, iteration and selection are answered directly
+    from the file. Anything which needs the full set of tuples (including
+    :meth:`add`) first decodes the whole file into memory; changes made after
+    that point are not written back to the file.
+    """
+
+    def __init__(self, *fields, **kwargs):
+        source = kwargs.pop('source', None)
+        super(MappedRelation, self).__init__(*fields, **kwargs)
+        if source is not None:
+            self._tuples = None
+            (self._buffer, self._cardinality,
+             self._dictionaries, self._codes) = source
+            self._positions = None
+
+    @property
+    def tuples(self):
+        if self._tuples is None:
+            self._tuples = dict((tuple_, tuple_)
+                                for tuple_ in self._iter_file())
+        return self._tuples
+
+    @tuples.setter
+    def tuples(self, tuples):
+        self._tuples = tuples
+
+    def close(self):
+
+        """
+        Decode any remaining tuples into memory and release the file.
+
+        The file stays mapped for as long as buffers returned by
+        :meth:`column` (or arrays sharing their memory) are still in use.
+        """
+
+        if self._tuples is None:
+            self._tuples = dict((tuple_, tuple_)
+                                for tuple_ in self._iter_file())
+        # Dropping the reference, rather than closing the map, leaves
+        # exported buffers valid; the map is closed with the last of them.
+        self._buffer = None
+
+    def __len__(self):
+        if self._tuples is None:
+            return self._cardinality
+        return len(self._tuples)
+
+    def __contains__(self, tuple_):
+        if self._tuples is not None:
+            return tuple_ in self._tuples
+        if self._positions is None:
+            self._positions = [
+                dict((value, code) for code, value in enumerate(values))
+                for values in self._dictionaries]
+        try:
+            target = tuple(position[value]
+                           for position, value in izip(self._positions,
+                                                       tuple_))
+        except (KeyError, TypeError):
+            return False
+        if len(target) != len(self._positions):
+            return False
+
+        low, high = 0, self._cardinality
+        while low < high:
+            middle = (low + high) // 2
+            row = self._row_codes(middle)
+            if row < target:
+                low = middle + 1
+            elif row > target:
+                high = middle
+            else:
+                return True
+        return False
+
+    def __iter__(self):
+        if self._tuples is not None:
+            return iter(self._tuples)
+        return self._iter_file()
+
+    @instrumented(hashes_output)
+    def select(self, predicate):
+        if self._tuples is not None:
+            return super(MappedRelation, self).select(predicate)
+        new_relation = Relation(*self.tuple._fields)
+        for tuple_ in self._iter_file():
+            if predicate(tuple_):
+                new_relation.tuples[tuple_] = tuple_
+        return new_relation
+    select.__doc__ = Relation.select.__doc__
+
+    @property
+    def is_mapped(self):
+        """True while tuples are still being read from the file."""
+
+        return self._tuples is None
+
+    def column(self, field):
+
+        """
+        Get the encoded contents of one field, without decoding any tuples.
+
+        Returns ``(codes, values)``, where ``codes`` is a read-only buffer over
+        the field's 32-bit little-endian codes in the file (one per tuple) and
+        ``values`` is the sorted list of distinct values they index.
+        """
+
+        check_defined(self, [field], 'column')
+        if not self.is_mapped:
+            raise RelationalError("Relation is no longer backed by its file")
+        index = self.tuple._fields.index(field)
+        return (buffer(self._buffer, self._codes[index],
+                       self._cardinality * CODE.size),
+                self._dictionaries[index])
+
+    def _ordered_iter(self, keys):
+        # Tuples are stored sorted on all fields, in field order.
+        fields = self.tuple._fields
+        if (self.is_mapped and
+                not any(descending for _, descending in keys) and
+                tuple(field for field, _ in keys) == fields[:len(keys)]):
+            return self._iter_file()
+        return None
+
+    def _row_codes(self, index):
+        return tuple(CODE.unpack_from(self._buffer, offset + index * CODE.size)[0]
+                     for offset in self._codes)
+
+    def _iter_file(self):
+        for start in xrange(0, self._cardinality, CHUNK_SIZE):
+            stop = min(start + CHUNK_SIZE, self._cardinality)
+            value_columns = []
+            for offset, values in izip(self._codes, self._dictionaries):
+                codes = array(CODE_TYPE)
+                codes.fromstring(self._buffer[offset + start * CODE.size:
+                                              offset + stop * CODE.size])
+                if sys.byteorder == 'big':
+                    codes.byteswap()
+                value_columns.append([values[code] for code in codes])
+            for row in izip(*value_columns):
+                yield self.tuple(*row)
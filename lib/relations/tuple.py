@@ -1,6 +1,46 @@
 import urecord
 
 
+# Generated kernels, keyed on the shape of the operation rather than on the
+# tuple classes involved, so that they're shared between relations.
+kernel_cache = {}
+projection_cache = {}
+
+
+def compile_kernel(arguments, body):
+
+    """
+    Compile (and cache) a function factory for a row-level kernel.
+
+    Returns a function taking ``(make, cls)`` and returning
+    ``lambda <arguments>: <body>``, in which ``make`` and ``cls`` are bound.
+    """
+
+    source = 'lambda make, cls: lambda %s: %s' % (arguments, body)
+    try:
+        return kernel_cache[source]
+    except KeyError:
+        return kernel_cache.setdefault(source, eval(source))
+
+
+def item_list(items):
+    """Format a sequence of expressions as a Python tuple display."""
+
+    return '(%s)' % (''.join('%s, ' % (item,) for item in items),)
+
+
+def key_function(indices):
+
+    """
+    Build a function restricting a tuple to the given indices.
+
+    The result is a plain tuple, suitable for use as a hash key.
+    """
+
+    return compile_kernel('t', item_list('t[%d]' % i for i in indices))(
+        None, None)
+
+
 class Tuple(urecord.RecordInstance):
 
     """
@@ -14,7 +54,12 @@ class Tuple(urecord.RecordInstance):
 
     @classmethod
     def _make_projection(cls, *fields):
-        return tuple(cls._fields.index(field) for field in fields)
+        key = (cls._fields, fields)
+        try:
+            return projection_cache[key]
+        except KeyError:
+            return projection_cache.setdefault(key, tuple(
+                cls._fields.index(field) for field in fields))
 
     @classmethod
     def _make_reordering(cls, **new_fields):
@@ -23,5 +68,37 @@ class Tuple(urecord.RecordInstance):
         return tuple(cls._fields.index(old_field)
                      for new_field, old_field in sorted(new_fields.items()))
 
+    @classmethod
+    def _projector(cls, indices):
+
+        """
+        Build a function creating instances of this class from other tuples.
+
+        The new tuple's values are taken from the given indices of the
+        original tuple, in order.
+        """
+
+        values = item_list('t[%d]' % i for i in indices)
+        if issubclass(cls, tuple):
+            return compile_kernel('t', 'make(cls, %s)' % (values,))(
+                tuple.__new__, cls)
+        return compile_kernel('t', 'cls(*%s)' % (values,))(None, cls)
+
+    @classmethod
+    def _merger(cls, sources):
+
+        """
+        Build a function creating instances of this class from two tuples.
+
+        ``sources`` gives, for each field of this class, a pair of ``(0, i)``
+        (take index ``i`` of the first tuple) or ``(1, i)`` (of the second).
+        """
+
+        values = item_list('%s[%d]' % ('ab'[side], i) for side, i in sources)
+        if issubclass(cls, tuple):
+            return compile_kernel('a, b', 'make(cls, %s)' % (values,))(
+                tuple.__new__, cls)
+        return compile_kernel('a, b', 'cls(*%s)' % (values,))(None, cls)
+
     def _index_restrict(self, *indices):
         return tuple(self[index] for index in indices)
@@ -21,4 +21,7 @@ setup(
     install_requires=[
         'urecord>=0.0.4',
     ],
+    extras_require={
+        'arrow': ['pyarrow'],
+    },
 )
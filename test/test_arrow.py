@@ -0,0 +1,44 @@
+import os
+import shutil
+import tempfile
+
+from nose.plugins.skip import SkipTest
+
+import relations
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+def setup_module():
+    if pyarrow is None:
+        raise SkipTest("pyarrow is not installed")
+
+
+employees = relations.Relation('name', 'dept_name')
+employees.add(name='Harry', dept_name='Finance')
+employees.add(name='Sally', dept_name='Sales')
+employees.add(name='George', dept_name='Finance')
+
+
+def test_arrow_round_trip():
+    table = employees.to_arrow()
+    assert table.num_rows == 3
+    assert table.schema.names == ['dept_name', 'name']
+    assert set(relations.Relation.from_arrow(table)) == set(employees)
+
+
+def test_opened_relations_convert_to_dictionary_arrays():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'relation.bin')
+        employees.save(path)
+        table = relations.Relation.open(path).to_arrow()
+        loaded = relations.Relation.from_arrow(table)
+    finally:
+        shutil.rmtree(directory)
+    for field in table.schema:
+        assert isinstance(field.type, pyarrow.DictionaryType)
+    assert set(loaded) == set(employees)
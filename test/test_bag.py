@@ -0,0 +1,42 @@
+from nose.tools import assert_raises
+
+import relations
+
+
+employees = relations.Relation('name', 'dept_name', 'salary')
+employees.add(name='Harry', dept_name='Finance', salary=300)
+employees.add(name='Sally', dept_name='Sales', salary=250)
+employees.add(name='George', dept_name='Finance', salary=500)
+employees.add(name='Harriet', dept_name='Sales', salary=400)
+
+
+def test_bag_operators_keep_duplicates():
+    departments = employees.as_bag().project('dept_name')
+    assert len(departments) == 4
+    assert departments.counts()[departments.tuple(dept_name='Sales')] == 2
+
+
+def test_distinct_returns_a_relation():
+    departments = (employees.as_bag()
+                   .select(lambda emp: emp.salary > 260)
+                   .rename(section='dept_name')
+                   .project('section')
+                   .distinct())
+    assert isinstance(departments, relations.Relation)
+    assert len(departments) == 2
+    assert departments.contains(section='Sales')
+
+
+def test_union_all_concatenates():
+    bag = employees.as_bag().union_all(employees)
+    assert len(bag) == 8
+    assert len(bag.distinct()) == 4
+    assert_raises(relations.NotUnionCompatible,
+                  lambda: bag.union_all(employees.project('name')))
+
+
+def test_bag_operators_raise_error_on_undefined_fields():
+    bag = employees.as_bag()
+    assert_raises(relations.UndefinedFields, lambda: bag.project('foobar'))
+    assert_raises(relations.UndefinedFields,
+                  lambda: bag.rename(newfield='foobar'))
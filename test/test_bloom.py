@@ -0,0 +1,87 @@
+import cPickle as pickle
+from decimal import Decimal
+
+import relations
+from relations.bloom import BloomFilter
+
+
+employees = relations.Relation('name', 'emp_id', 'dept_name')
+employees.add(name='Harry', emp_id=3415, dept_name='Finance')
+employees.add(name='Sally', emp_id=2241, dept_name='Sales')
+employees.add(name='George', emp_id=3401, dept_name='Finance')
+employees.add(name='Harriet', emp_id=2202, dept_name='Sales')
+employees.add(name='Charlie', emp_id=1001, dept_name='Marketing')
+
+departments = relations.Relation('dept_name', 'manager')
+departments.add(dept_name='Finance', manager='George')
+departments.add(dept_name='Sales', manager='Harriet')
+departments.add(dept_name='Production', manager='Charles')
+
+
+def test_a_bloom_filter_has_no_false_negatives():
+    filter_ = BloomFilter(['n'], 1000)
+    for n in xrange(1000):
+        filter_.add((n,))
+    assert all((n,) in filter_ for n in xrange(1000))
+    false_positives = sum(1 for n in xrange(1000, 11000) if (n,) in filter_)
+    assert false_positives < 300
+
+
+def test_a_bloom_filter_survives_serialization():
+    filter_ = departments.bloom_filter('dept_name')
+    for copy in (BloomFilter.from_bytes(filter_.to_bytes()),
+                 pickle.loads(pickle.dumps(filter_))):
+        assert copy.fields == ('dept_name',)
+        assert ('Sales',) in copy
+        assert copy.bits == filter_.bits
+
+
+def test_prefilter_keeps_every_matching_tuple():
+    filtered = employees.prefilter(departments.bloom_filter('dept_name'))
+    assert filtered.heading == employees.heading
+    assert filtered.contains(name='Sally', emp_id=2241, dept_name='Sales')
+    assert len(filtered) >= 4
+
+
+def test_a_prefiltered_join_gives_the_same_results():
+    filter_ = BloomFilter.from_bytes(
+        departments.bloom_filter('dept_name').to_bytes())
+    joined = employees.prefilter(filter_).natural_join(departments)
+    assert set(joined) == set(employees.natural_join(departments))
+    assert len(joined) == 4
+
+
+def test_semijoin_selects_matching_tuples():
+    matched = employees.semijoin(departments)
+    assert matched.heading == employees.heading
+    assert len(matched) == 4
+    assert not matched.contains(name='Charlie', emp_id=1001,
+                                dept_name='Marketing')
+
+
+def test_equal_keys_of_different_types_match():
+    filter_ = BloomFilter(['dept_name', 'floor'], 10)
+    filter_.add(('Sales', 1))
+    filter_.add((u'Finance', 2.0))
+    assert (u'Sales', 1.0) in filter_
+    assert ('Sales', 1L) in filter_
+    assert ('Finance', 2) in filter_
+    assert (u'Finance', True + 1) in filter_
+    assert ('Sales', Decimal('1.00')) in filter_
+    assert ('Finance', Decimal(2)) in filter_
+    assert ('Sales', 1 + 0j) in filter_
+
+    offices = relations.Relation('dept_name', 'floor')
+    offices.add(dept_name=u'Sales', floor=1.0)
+    staff = relations.Relation('name', 'dept_name', 'floor')
+    staff.add(name='Sally', dept_name='Sales', floor=1)
+    filter_ = offices.bloom_filter('dept_name', 'floor')
+    assert len(staff.prefilter(filter_)) == 1
+
+    accounts = relations.Relation('dept_name', 'budget')
+    accounts.add(dept_name='Sales', budget=Decimal('10'))
+    filter_ = accounts.bloom_filter('dept_name', 'budget')
+    budgets = relations.Relation('dept_name', 'budget')
+    budgets.add(dept_name='Sales', budget=10)
+    budgets.add(dept_name='Sales', budget=Decimal('10.5'))
+    assert len(budgets.prefilter(filter_)) == 1
@@ -0,0 +1,54 @@
+from StringIO import StringIO
+
+from nose.tools import assert_raises
+
+import relations
+
+
+employees = relations.Relation('name', 'dept_name')
+employees.add(name='Harry', dept_name='Finance')
+employees.add(name='Sally', dept_name='Sales')
+employees.add(name='George', dept_name='Finance')
+
+
+def test_add_rows_adds_tuples_in_field_order():
+    employees = relations.Relation('name', 'dept_name')
+    employees.add_rows([('Finance', 'Harry'), ('Sales', 'Sally')])
+    assert len(employees) == 2
+    assert employees.contains(name='Sally', dept_name='Sales')
+
+
+def test_from_csv_reads_heading_from_header_row():
+    source = StringIO('name,dept_name\r\nHarry,Finance\r\nSally,Sales\r\n')
+    employees = relations.Relation.from_csv(source, chunk_size=1)
+    assert employees.heading == set(['name', 'dept_name'])
+    assert len(employees) == 2
+    assert employees.contains(name='Harry', dept_name='Finance')
+
+
+def test_from_csv_can_read_a_subset_of_columns():
+    source = StringIO('name,dept_name\r\nHarry,Finance\r\nGeorge,Finance\r\n')
+    departments = relations.Relation.from_csv(source, fields=['dept_name'])
+    assert len(departments) == 1
+
+
+def test_from_csv_raises_error_on_undefined_fields():
+    source = StringIO('name,dept_name\r\nHarry,Finance\r\n')
+    assert_raises(relations.UndefinedFields,
+                  lambda: relations.Relation.from_csv(source, fields=['age']))
+
+
+def test_csv_round_trip():
+    output = StringIO()
+    employees.to_csv(output)
+    loaded = relations.Relation.from_csv(StringIO(output.getvalue()))
+    assert set(loaded) == set(employees)
+
+
+def test_jsonl_round_trip():
+    output = StringIO()
+    employees.to_jsonl(output)
+    loaded = relations.Relation.from_jsonl(StringIO(output.getvalue()),
+                                           chunk_size=2)
+    assert loaded.heading == set(['name', 'dept_name'])
+    assert set(loaded) == set(employees)
@@ -0,0 +1,99 @@
+import sqlite3
+import threading
+
+from nose.tools import assert_raises
+
+import relations
+from relations.ingest import Ingester
+from relations.sqlite import SQLiteRelation
+
+
+def test_ingester_commits_rows_in_batches():
+    events = relations.Relation('event_id', 'user_id')
+    batches = []
+    with Ingester(events, batch_size=100) as ingester:
+        ingester.subscribe(batches.append)
+        ingester.feed((event_id, event_id % 7) for event_id in xrange(250))
+        ingester.put({'event_id': 250, 'user_id': 1})
+    assert len(events) == 251
+    assert events.contains(event_id=250, user_id=1)
+    assert sorted(len(batch) for batch in batches)[-1] == 100
+    assert sum(len(batch) for batch in batches) == 251
+
+
+def test_ingester_applies_backpressure_to_many_producers():
+    events = relations.Relation('event_id', 'producer')
+    ingester = Ingester(events, batch_size=50, max_pending=10)
+
+    def produce(producer):
+        ingester.feed((event_id, producer) for event_id in xrange(200))
+    producers = [threading.Thread(target=produce, args=(n,))
+                 for n in xrange(4)]
+    for producer in producers:
+        producer.start()
+    for producer in producers:
+        producer.join()
+    ingester.close()
+    assert len(events) == 800
+
+
+def test_waiting_for_a_commit():
+    events = relations.Relation('event_id')
+    ingester = Ingester(events, batch_size=10)
+    version = ingester.version
+    ingester.feed((event_id,) for event_id in xrange(10))
+    assert ingester.wait(version, timeout=5) > version
+    with ingester.lock:
+        assert len(events) == 10
+    ingester.close()
+
+
+def test_unthreaded_ingester_commits_when_batches_fill():
+    events = relations.Relation('event_id')
+    ingester = Ingester(events, batch_size=10, threaded=False)
+    ingester.feed((event_id,) for event_id in xrange(15))
+    assert len(events) == 10
+    ingester.flush()
+    assert len(events) == 15
+
+
+def test_ingesting_into_sqlite_on_the_worker_thread():
+    events = SQLiteRelation('event_id', 'user_id')
+    with Ingester(events, batch_size=100) as ingester:
+        ingester.feed((event_id, event_id % 7) for event_id in xrange(250))
+    assert len(events) == 250
+    assert not ingester.failed
+
+    thread_bound = SQLiteRelation('event_id',
+                                  database=sqlite3.connect(':memory:'))
+    assert_raises(ValueError, lambda: Ingester(thread_bound))
+    with Ingester(thread_bound, batch_size=10, threaded=False) as ingester:
+        ingester.feed((event_id,) for event_id in xrange(25))
+    assert len(thread_bound) == 25
+
+
+class FullRelation(relations.Relation):
+
+    def add_rows(self, rows):
+        raise relations.RelationalError("No room for more tuples")
+
+
+def test_rows_which_fail_to_commit_are_kept():
+    ingester = Ingester(FullRelation('event_id'), batch_size=10)
+    ingester.feed([(1,), (2,)])
+    assert_raises(relations.RelationalError, ingester.flush)
+    assert ingester.failed == [(1,), (2,)]
+    ingester.close()
+
+
+def test_a_closed_ingester_rejects_rows():
+    for threaded in (True, False):
+        events = relations.Relation('event_id')
+        ingester = Ingester(events, threaded=threaded)
+        ingester.put((1,))
+        ingester.close()
+        assert_raises(ValueError, lambda: ingester.put((2,)))
+        assert_raises(ValueError, lambda: ingester.feed([(3,)]))
+        assert_raises(ValueError, ingester.flush)
+        ingester.close()
+        assert len(events) == 1
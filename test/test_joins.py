@@ -23,3 +23,12 @@ def test_natural_join_on_disjoint_relations_is_cartesian_product():
     joined = employees.project('name', 'emp_id').natural_join(departments)
 
     assert len(joined) == (len(employees) * len(departments))
+
+
+def test_natural_join_merges_fields_from_both_relations():
+    joined = departments.natural_join(employees)
+
+    assert joined.contains(name='Sally', emp_id=2241, dept_name='Sales',
+                           manager='Harriet')
+    assert not joined.contains(name='Sally', emp_id=2241, dept_name='Sales',
+                               manager='George')
@@ -0,0 +1,61 @@
+import relations
+from relations.predicates import Field
+from relations.sqlite import SQLiteRelation
+
+
+employees = relations.Relation('name', 'dept_name', 'salary')
+employees.add(name='Harry', dept_name='Finance', salary=300)
+employees.add(name='Sally', dept_name='Sales', salary=250)
+employees.add(name='George', dept_name='Finance', salary=500)
+employees.add(name='Harriet', dept_name='Sales', salary=400)
+
+
+def test_discard_removes_a_single_tuple():
+    for relation_class in (relations.Relation, SQLiteRelation):
+        staff = relation_class('name', 'dept_name', 'salary').update(employees)
+        assert staff.discard(name='Sally', dept_name='Sales', salary=250)
+        assert not staff.discard(name='Sally', dept_name='Sales', salary=250)
+        assert len(staff) == 3
+
+
+def test_delete_removes_matching_tuples():
+    for relation_class in (relations.Relation, SQLiteRelation):
+        staff = relation_class('name', 'dept_name', 'salary').update(employees)
+        assert staff.delete(lambda emp: emp.salary < 350) == 2
+        assert staff.delete(Field('dept_name') == 'Sales') == 1
+        assert len(staff) == 1
+        assert staff.contains(name='George', dept_name='Finance', salary=500)
+
+
+def test_delete_looks_up_fully_specified_tuples():
+    staff = employees.clone().update(employees)
+    predicate = ((Field('name') == 'Harry') & (Field('dept_name') == 'Finance') &
+                 (Field('salary') == 300))
+    assert staff._tuple_for(predicate) is not None
+    assert staff.delete(predicate) == 1
+    assert staff.delete(predicate) == 0
+    assert len(staff) == 3
+
+
+def test_update_where_changes_matching_tuples():
+    for relation_class in (relations.Relation, SQLiteRelation):
+        staff = relation_class('name', 'dept_name', 'salary').update(employees)
+        assert staff.update_where(Field('dept_name') == 'Sales',
+                                  dept_name='Marketing') == 2
+        assert staff.contains(name='Sally', dept_name='Marketing', salary=250)
+        assert not staff.contains(name='Sally', dept_name='Sales', salary=250)
+        assert staff.update_where(lambda emp: emp.name.startswith('H'),
+                                  salary=0) == 2
+        assert staff.contains(name='Harriet', dept_name='Marketing', salary=0)
+        assert len(staff) == 4
+        assert len(employees) == 4
+
+
+def test_update_where_merges_colliding_tuples():
+    for relation_class in (relations.Relation, SQLiteRelation):
+        staff = relation_class('name', 'dept_name')
+        staff.add(name='Sally', dept_name='Sales')
+        staff.add(name='Sally', dept_name='Marketing')
+        staff.update_where(Field('dept_name') == 'Sales',
+                           dept_name='Marketing')
+        assert len(staff) == 1
@@ -0,0 +1,67 @@
+from nose.tools import assert_raises
+
+import relations
+
+
+employees = relations.Relation('name', 'dept_name', 'salary')
+employees.add(name='Harry', dept_name='Finance', salary=300)
+employees.add(name='Sally', dept_name='Sales', salary=250)
+employees.add(name='George', dept_name='Finance', salary=500)
+employees.add(name='Harriet', dept_name='Sales', salary=400)
+employees.add(name='Bob', dept_name='Sales', salary=100)
+
+
+def names(tuples):
+    return [tuple_.name for tuple_ in tuples]
+
+
+def test_order_by_sorts_tuples():
+    assert names(employees.order_by('salary')) == [
+        'Bob', 'Sally', 'Harry', 'Harriet', 'George']
+    assert names(employees.order_by('-salary').limit(2)) == [
+        'George', 'Harriet']
+
+
+def test_order_by_supports_mixed_directions():
+    assert names(employees.order_by('dept_name', '-salary').limit(3)) == [
+        'George', 'Harry', 'Harriet']
+
+
+def test_order_by_raises_error_on_undefined_fields():
+    assert_raises(relations.UndefinedFields,
+                  lambda: employees.order_by('age'))
+
+
+def test_limit_returns_a_smaller_relation():
+    limited = employees.limit(2)
+    assert limited.heading == employees.heading
+    assert len(limited) == 2
+    assert len(employees.limit(10)) == 5
+
+
+def test_top_k_selects_within_groups():
+    top = employees.top_k(2, '-salary', by=['dept_name'])
+    assert sorted(names(top)) == ['George', 'Harriet', 'Harry', 'Sally']
+
+    lowest = employees.top_k(1, 'salary')
+    assert names(lowest) == ['Bob']
+
+
+class OrderedRelation(relations.Relation):
+
+    """Counts how many tuples are read from its own ordering."""
+
+    read = 0
+
+    def _ordered_iter(self, keys):
+        for tuple_ in employees.order_by(*[('-' if descending else '') + field
+                                           for field, descending in keys]):
+            self.read += 1
+            yield tuple_
+
+
+def test_top_k_without_groups_stops_early_on_ordered_relations():
+    staff = OrderedRelation('name', 'dept_name', 'salary').update(employees)
+    top = staff.top_k(2, '-salary')
+    assert sorted(names(top)) == ['George', 'Harriet']
+    assert staff.read == 2
@@ -0,0 +1,82 @@
+import relations
+from relations import profiling
+
+
+employees = relations.Relation('name', 'emp_id', 'dept_name')
+employees.add(name='Harry', emp_id=3415, dept_name='Finance')
+employees.add(name='Sally', emp_id=2241, dept_name='Sales')
+employees.add(name='George', emp_id=3401, dept_name='Finance')
+employees.add(name='Harriet', emp_id=2202, dept_name='Sales')
+
+departments = relations.Relation('dept_name', 'manager')
+departments.add(dept_name='Finance', manager='George')
+departments.add(dept_name='Sales', manager='Harriet')
+departments.add(dept_name='Production', manager='Charles')
+
+
+def test_operators_are_not_recorded_without_hooks():
+    selected = employees.select(lambda emp: emp.dept_name == 'Sales')
+    assert getattr(selected, 'profile', None) is None
+
+
+def test_analyze_records_each_operator_call():
+    with profiling.analyze() as calls:
+        finance = employees.select(lambda emp: emp.dept_name == 'Finance')
+        joined = finance.natural_join(departments)
+
+    assert [call.operator for call in calls] == ['select', 'natural_join']
+    assert calls[0].input_cardinalities == [4]
+    assert calls[0].output_cardinality == 2
+    assert calls[1].input_cardinalities == [2, 3]
+    assert calls[1].inputs[0] is calls[0]
+    assert joined.profile is calls[1]
+    assert not profiling.hooks
+
+
+def test_explain_shows_the_operator_tree():
+    with profiling.analyze():
+        joined = employees.project('dept_name').natural_join(departments)
+
+    lines = profiling.explain(joined).splitlines()
+    assert lines[0].startswith('natural_join  (rows=2, in=[2, 3]')
+    assert lines[1].startswith('  project  (rows=2, in=[4]')
+    assert lines[2].startswith('    <Relation(')
+    assert lines[3].startswith("  <Relation('dept_name', 'manager')>")
+
+
+def test_hooks_are_called_once_per_top_level_operator():
+    calls = []
+    profiling.add_hook(calls.append)
+    try:
+        employees.union(employees)
+    finally:
+        profiling.remove_hook(calls.append)
+
+    assert [call.operator for call in calls] == ['union']
+
+
+def test_memory_is_measured_for_every_call():
+    numbers = relations.Relation('n')
+    numbers.add_rows((n,) for n in xrange(100000))
+    with profiling.analyze() as calls:
+        first = numbers.select(lambda tuple_: True)
+        second = numbers.select(lambda tuple_: True)
+
+    if profiling.current_rss_kb() is None:
+        assert [call.rss_kb for call in calls] == [None, None]
+    else:
+        assert all(call.rss_kb > 0 for call in calls)
+
+
+def test_in_place_operators_are_recorded():
+    staff = employees.clone().update(employees)
+    with profiling.analyze() as calls:
+        staff -= employees.select(lambda emp: emp.dept_name == 'Sales')
+        staff |= employees
+
+    assert [call.operator for call in calls] == [
+        'select', 'difference_update', 'update']
+    assert calls[1].input_cardinalities == [4, 2]
+    assert calls[1].output_cardinality == 2
+    assert calls[1].inputs[1] is calls[0]
+    assert calls[2].output_cardinality == 4
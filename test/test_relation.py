@@ -97,3 +97,11 @@ def test_rename_raises_error_on_undefined_fields():
 
     assert_raises(relations.UndefinedFields,
                   lambda: employees.rename(newfield='foobar'))
+
+
+def test_project_handles_fields_given_out_of_order():
+    employees = relations.Relation('employee_name', 'dept_name', 'salary')
+    employees.add(employee_name='Alice', dept_name='Finance', salary=100)
+
+    projected = employees.project('employee_name', 'dept_name')
+    assert projected.contains(employee_name='Alice', dept_name='Finance')
@@ -66,3 +66,40 @@ def test_difference_contains_elements_present_in_self_but_not_in_other():
     diff = rel1.difference(rel2)
     assert len(diff) == 1
     assert diff.contains(name='Alice', age=25, gender='F')
+
+
+def test_symmetric_difference_contains_elements_present_in_only_one_relation():
+    rel1 = relations.Relation('name', 'age', 'gender')
+    rel2 = relations.Relation('gender', 'age', 'name')
+    rel1.add(name='Alice', age=25, gender='F')
+    rel1.add(name='Bob', age=32, gender='M')
+    rel2.add(name='Bob', age=32, gender='M')
+    rel2.add(name='Charlie', age=65, gender='M')
+
+    symdiff = rel1 ^ rel2
+    assert len(symdiff) == 2
+    assert symdiff.contains(name='Alice', age=25, gender='F')
+    assert symdiff.contains(name='Charlie', age=65, gender='M')
+
+
+def test_in_place_set_operations_modify_the_left_relation():
+    rel1 = relations.Relation('name', 'age', 'gender')
+    rel2 = relations.Relation('gender', 'age', 'name')
+    rel1.add(name='Alice', age=25, gender='F')
+    rel1.add(name='Bob', age=32, gender='M')
+    rel1.add(name='Charlie', age=65, gender='M')
+    rel2.add(name='Bob', age=32, gender='M')
+
+    original = rel1
+    rel1 -= rel2
+    assert rel1 is original
+    assert len(rel1) == 2
+    assert not rel1.contains(name='Bob', age=32, gender='M')
+
+    rel1 |= rel2
+    assert len(rel1) == 3
+
+    rel1 &= rel2
+    assert len(rel1) == 1
+    assert rel1.contains(name='Bob', age=32, gender='M')
+    assert len(rel2) == 1
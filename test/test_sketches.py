@@ -0,0 +1,74 @@
+import cPickle as pickle
+
+from nose.tools import assert_raises
+
+import relations
+from relations.sketches import HyperLogLog
+from relations.sqlite import SQLiteRelation
+
+
+def make_events(count):
+    events = relations.Relation('event_id', 'user_id')
+    events.add_rows((event_id, event_id % 500) for event_id in xrange(count))
+    return events
+
+
+def test_hyperloglog_estimates_distinct_values():
+    sketch = HyperLogLog()
+    for n in xrange(20000):
+        sketch.add(n % 5000)
+    assert abs(sketch.cardinality() - 5000) < 250
+
+
+def test_hyperloglog_sketches_merge():
+    evens, odds = HyperLogLog(), HyperLogLog()
+    for n in xrange(0, 4000, 2):
+        evens.add(n)
+        odds.add(n + 1)
+    merged = pickle.loads(pickle.dumps(evens)).update(odds)
+    assert abs(merged.cardinality() - 4000) < 200
+    assert_raises(ValueError, lambda: evens.update(HyperLogLog(precision=10)))
+
+
+def test_estimate_distinct_approximates_projection_size():
+    events = make_events(3000)
+    assert abs(events.estimate_distinct('user_id') - 500) < 25
+
+
+def test_tracked_sketches_are_updated_on_add():
+    events = make_events(100)
+    sketch = events.track_distinct('user_id')
+    assert abs(sketch.cardinality() - 100) < 5
+    events.add_rows((event_id, event_id % 500) for event_id in xrange(2000))
+    events.add(event_id=5000, user_id=5000)
+    assert events.track_distinct('user_id') is sketch
+    assert abs(events.estimate_distinct('user_id') - 501) < 25
+
+
+def test_tracked_sketches_see_symmetric_difference_updates():
+    for relation_class in (relations.Relation, SQLiteRelation):
+        events = relation_class('event_id', 'user_id')
+        events.add_rows((event_id, event_id) for event_id in xrange(10))
+        events.track_distinct('user_id')
+        others = relations.Relation('event_id', 'user_id')
+        others.add_rows((event_id, event_id) for event_id in xrange(5, 1010))
+        events ^= others
+        assert len(events) == 1005
+        assert abs(events.estimate_distinct('user_id') - 1010) < 50
+
+
+def test_equal_values_are_counted_once():
+    sketch = HyperLogLog()
+    for value in (1, 1L, 1.0, True, 'a', u'a', (1, 'a'), (1.0, u'a')):
+        sketch.add(value)
+    assert sketch.cardinality() == 3
+
+
+def test_sample_returns_a_subset():
+    events = make_events(1000)
+    sample = events.sample(10, seed=1)
+    assert sample.heading == events.heading
+    assert len(sample) == 10
+    assert all(tuple_ in events for tuple_ in sample)
+    assert set(events.sample(10, seed=1)) == set(sample)
+    assert len(events.sample(0.25)) == 250
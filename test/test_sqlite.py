@@ -0,0 +1,188 @@
+from nose.tools import assert_raises
+
+import relations
+from relations.predicates import Field
+from relations.sqlite import SQLiteRelation
+
+
+employees = relations.Relation('name', 'emp_id', 'dept_name')
+employees.add(name='Harry', emp_id=3415, dept_name='Finance')
+employees.add(name='Sally', emp_id=2241, dept_name='Sales')
+employees.add(name='George', emp_id=3401, dept_name='Finance')
+employees.add(name='Harriet', emp_id=2202, dept_name='Sales')
+
+departments = relations.Relation('dept_name', 'manager')
+departments.add(dept_name='Finance', manager='George')
+departments.add(dept_name='Sales', manager='Harriet')
+departments.add(dept_name='Production', manager='Charles')
+
+stored_employees = SQLiteRelation('name', 'emp_id', 'dept_name')
+stored_employees.update(employees)
+
+
+def test_a_sqlite_relation_is_a_set():
+    stored = SQLiteRelation('name', 'emp_id', 'dept_name').update(employees)
+    stored.add(name='Harry', emp_id=3415, dept_name='Finance')
+    assert len(stored) == 4
+    assert stored.contains(name='Sally', emp_id=2241, dept_name='Sales')
+    assert not stored.contains(name='Sally', emp_id=2241, dept_name='Finance')
+
+
+def test_select_accepts_predicates_and_callables():
+    sql_selected = stored_employees.select((Field('dept_name') == 'Finance') &
+                                    (Field('emp_id') > 3405))
+    python_selected = stored_employees.select(
+        lambda emp: emp.dept_name == 'Finance' and emp.emp_id > 3405)
+    assert isinstance(sql_selected, SQLiteRelation)
+    assert set(sql_selected) == set(python_selected)
+    assert len(sql_selected) == 1
+
+
+def test_predicates_treat_null_like_none():
+    rows = [('Harry', 'George'), ('George', None), ('Sally', 'Zoe')]
+    in_memory = relations.Relation('name', 'mgr')
+    in_memory.add_rows([(mgr, name) for name, mgr in rows])
+    in_sqlite = SQLiteRelation('name', 'mgr')
+    in_sqlite.add_rows([(mgr, name) for name, mgr in rows])
+
+    mgr = Field('mgr')
+    for predicate in [mgr == 'George', mgr != 'George', ~(mgr == 'George'),
+                      mgr == None, mgr != None, mgr < 'Y', mgr <= 'George',
+                      mgr > 'George', mgr >= 'George', mgr > None,
+                      mgr >= None, mgr < None, mgr <= None,
+                      mgr.isin(['George']), ~mgr.isin(['George']),
+                      mgr.isin(['Zoe', None]), ~mgr.isin(['Zoe', None])]:
+        assert (set(in_sqlite.select(predicate)) ==
+                set(in_memory.select(predicate))), predicate
+
+
+def test_tuples_holding_none_are_stored_once():
+    managers = SQLiteRelation('name', 'mgr')
+    managers.add(name='George', mgr=None)
+    managers.add(name='George', mgr=None)
+    managers.add_rows([(None, 'George'), (None, 'Harry')])
+    assert len(managers) == 2
+    assert len(list(managers)) == 2
+
+    in_memory = relations.Relation('name', 'mgr')
+    in_memory.add(name='George', mgr=None)
+    in_memory.add(name='Sally', mgr='George')
+    assert len(managers | in_memory) == 3
+
+    managers.update_where(Field('name') == 'Harry', name='George')
+    assert len(managers) == 1
+
+
+def test_unicode_values_round_trip():
+    cafes = relations.Relation('name', 'city')
+    cafes.add(name=u'Caf\xe9 Central', city='Vienna')
+    cafes.add(name='Sacher', city=u'Vienna')
+    stored = SQLiteRelation('name', 'city').update(cafes)
+    assert set(stored) == set(cafes)
+    assert len(stored ^ cafes) == 0
+    assert len(cafes.natural_join(stored)) == 2
+
+
+def test_predicates_work_on_in_memory_relations():
+    employees = relations.Relation('name', 'dept_name')
+    employees.add(name='Harry', dept_name='Finance')
+    employees.add(name='Sally', dept_name='Sales')
+    selected = employees.select(Field('dept_name').isin(['Sales', 'HR']))
+    assert len(selected) == 1
+
+
+def test_project_and_rename():
+    assert len(stored_employees.project('dept_name')) == 2
+    renamed = stored_employees.rename(section='dept_name')
+    assert renamed.contains(name='Harry', emp_id=3415, section='Finance')
+    assert_raises(relations.UndefinedFields,
+                  lambda: stored_employees.project('foobar'))
+
+
+def test_set_operations_with_in_memory_relations():
+    stored = SQLiteRelation('name', 'emp_id', 'dept_name').update(employees)
+    others = relations.Relation('name', 'emp_id', 'dept_name')
+    others.add(name='Harry', emp_id=3415, dept_name='Finance')
+    others.add(name='Bob', emp_id=1, dept_name='Sales')
+
+    assert len(stored.union(others)) == 5
+    assert len(stored.intersection(others)) == 1
+    assert len(stored.difference(others)) == 3
+    assert len(stored ^ others) == 4
+    stored -= others
+    assert len(stored) == 3
+
+
+class UnmaterializedRelation(SQLiteRelation):
+
+    @property
+    def tuples(self):
+        raise AssertionError('the whole table was read into memory')
+
+    @tuples.setter
+    def tuples(self, tuples):
+        pass
+
+
+def test_set_operations_probe_a_sqlite_right_operand():
+    others = UnmaterializedRelation('name', 'emp_id', 'dept_name')
+    others.add(name='Harry', emp_id=3415, dept_name='Finance')
+    others.add(name='Bob', emp_id=1, dept_name='Sales')
+
+    assert len(employees.intersection(others)) == 1
+    assert len(employees.difference(others)) == 3
+    assert len(employees.symmetric_difference(others)) == 4
+    assert len(employees.clone().update(employees).difference_update(
+        others)) == 3
+    assert len(employees.clone().update(employees).intersection_update(
+        others)) == 1
+    in_memory = employees.clone().update(employees)
+    in_memory ^= others
+    assert len(in_memory) == 4
+    assert in_memory.contains(name='Bob', emp_id=1, dept_name='Sales')
+
+
+def test_temporary_tables_are_dropped():
+    stored = SQLiteRelation('name', 'emp_id', 'dept_name').update(employees)
+    others = relations.Relation('name', 'emp_id', 'dept_name')
+    others.add(name='Bob', emp_id=1, dept_name='Sales')
+
+    def temporary_tables():
+        return stored.connection.execute(
+            'SELECT COUNT(*) FROM sqlite_temp_master '
+            'WHERE type = "table"').fetchone()[0]
+
+    before = temporary_tables()
+    stored.update(others)
+    stored ^= others
+    stored.intersection_update(others)
+    assert temporary_tables() == before
+
+    union = stored | others
+    assert temporary_tables() == before + 1
+    union.close()
+    assert temporary_tables() == before
+    del union
+    stored.natural_join(others)
+    assert temporary_tables() == before
+
+
+def test_natural_join():
+    joined = stored_employees.natural_join(departments)
+    assert len(joined) == 4
+    assert joined.contains(name='Sally', emp_id=2241, dept_name='Sales',
+                           manager='Harriet')
+
+
+def test_natural_join_streams_past_a_larger_in_memory_relation():
+    sales = SQLiteRelation('dept_name', 'manager')
+    sales.add(dept_name='Sales', manager='Harriet')
+    joined = sales.natural_join(employees)
+    assert isinstance(joined, SQLiteRelation)
+    assert set(joined) == set(departments.natural_join(employees).select(
+        lambda emp: emp.dept_name == 'Sales'))
+
+
+def test_order_by_runs_in_sqlite():
+    ordered = stored_employees.order_by('-emp_id').limit(2)
+    assert [emp.name for emp in ordered] == ['Harry', 'George']
@@ -0,0 +1,86 @@
+from array import array
+import os
+import shutil
+import tempfile
+
+import relations
+from relations.storage import CODE_TYPE, MappedRelation
+
+
+employees = relations.Relation('name', 'emp_id', 'dept_name')
+employees.add(name='Harry', emp_id=3415, dept_name='Finance')
+employees.add(name='Sally', emp_id=2241, dept_name='Sales')
+employees.add(name='George', emp_id=3401, dept_name='Finance')
+employees.add(name='Harriet', emp_id=2202, dept_name='Sales')
+
+
+def saved_copy(relation, **kwargs):
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'relation.bin')
+        relation.save(path)
+        return relations.Relation.open(path, **kwargs)
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_a_saved_relation_can_be_opened():
+    loaded = saved_copy(employees)
+
+    assert isinstance(loaded, MappedRelation)
+    assert loaded.heading == employees.heading
+    assert len(loaded) == 4
+    assert set(loaded) == set(employees)
+
+
+def test_an_opened_relation_answers_membership_from_the_file():
+    loaded = saved_copy(employees, mmap=False)
+
+    assert loaded.contains(name='Sally', emp_id=2241, dept_name='Sales')
+    assert not loaded.contains(name='Sally', emp_id=2241, dept_name='Finance')
+    assert not loaded.contains(name='Bob', emp_id=1, dept_name='Sales')
+
+
+def test_an_opened_relation_supports_the_relational_operators():
+    loaded = saved_copy(employees)
+
+    finance = loaded.select(lambda emp: emp.dept_name == 'Finance')
+    assert len(finance) == 2
+    assert len(loaded.project('dept_name')) == 2
+    assert len(loaded.union(employees)) == 4
+    loaded.add(name='Bob', emp_id=1, dept_name='Sales')
+    assert len(loaded) == 5
+
+
+def test_an_empty_relation_can_be_saved():
+    loaded = saved_copy(relations.Relation('name', 'dept_name'))
+
+    assert len(loaded) == 0
+    assert list(loaded) == []
+
+
+def test_an_opened_relation_exposes_encoded_columns():
+    loaded = saved_copy(employees, mmap=False)
+
+    codes, values = loaded.column('dept_name')
+    assert values == ['Finance', 'Sales']
+    assert len(codes) == 4 * len(loaded)
+
+
+def test_exported_columns_outlive_changes_to_the_relation():
+    loaded = saved_copy(employees)
+
+    codes, values = loaded.column('dept_name')
+    loaded.add(name='Bob', emp_id=1, dept_name='Sales')
+    loaded.close()
+    assert not loaded.is_mapped
+    assert sorted(values[code] for code in array(CODE_TYPE, codes[:])) == [
+        'Finance', 'Finance', 'Sales', 'Sales']
+
+
+def test_an_opened_relation_streams_orderings_from_the_file():
+    loaded = saved_copy(employees)
+
+    assert loaded._ordered_iter([('dept_name', False)]) is not None
+    first = list(loaded.order_by('dept_name', 'emp_id').limit(2))
+    assert [emp.name for emp in first] == ['George', 'Harry']